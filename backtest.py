@@ -0,0 +1,195 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import prediction_models as pm
+import weather_schema as ws
+
+CACHE_DIR = '.backtest_cache'
+DATA_FILE = 'dataset/data.csv'
+WINDOW_DAYS = 365
+
+# Indian Meteorological Department seasons, by month
+SEASONS = {
+    1: 'Winter', 2: 'Winter',
+    3: 'Summer', 4: 'Summer', 5: 'Summer',
+    6: 'Southwest monsoon', 7: 'Southwest monsoon', 8: 'Southwest monsoon', 9: 'Southwest monsoon',
+    10: 'Northeast monsoon', 11: 'Northeast monsoon', 12: 'Northeast monsoon',
+}
+
+logger = logging.getLogger('backtest')
+
+# Models loaded once per worker process
+_worker_models = None
+
+
+# Function to hash every artifact a model depends on, plus the scoring setup
+def model_hash(model_name, model_dir, data_hash, window, cutoff):
+    digest = hashlib.sha256()
+    for filename in pm.MODEL_FILES[model_name]:
+        digest.update(pm.file_sha256(os.path.join(model_dir, filename)).encode())
+    digest.update(f"{data_hash}|next-day|{window}|{cutoff}".encode())
+    return digest.hexdigest()
+
+
+def cache_path(cache_dir, model_name, digest):
+    return os.path.join(cache_dir, f"{model_name.replace(' ', '_').lower()}-{digest[:16]}.json")
+
+
+# Function to find the last feature date the models were trained on, from the training manifest
+# Artifacts from before train_end was recorded fall back to counting train_rows over the rows
+# train_models.py trains on. Returns None when the training period is unknown (the bundled models)
+def training_cutoff(model_dir, data):
+    manifest = pm.load_manifest(model_dir)
+    if manifest is None:
+        return None
+    if 'train_end' in manifest:
+        return pd.Timestamp(manifest['train_end'])
+    trainable = data[pm.feature_names].notna().all(axis=1) & data['tmax'].shift(-1).notna()
+    return data.index[trainable.to_numpy()][manifest['train_rows'] - 1]
+
+
+# Function to label each feature row as in-sample or out-of-sample for the models
+def sample_labels(index, cutoff):
+    if cutoff is None:
+        return np.full(len(index), 'unknown', dtype=object)
+    return np.where(index <= cutoff, 'in-sample', 'out-of-sample').astype(object)
+
+
+# Function to build the feature matrix and the next-day tmax target the models are trained for
+# The models only forecast one day ahead, so that is the only horizon scored
+def prepare(data):
+    features = data[pm.feature_names].to_numpy(dtype=np.float64)
+    tmax = data['tmax'].to_numpy(dtype=np.float64)
+    months = data.index.month.to_numpy()
+
+    targets = np.full(len(data), np.nan)
+    target_seasons = np.full(len(data), '', dtype=object)
+    targets[:-1] = tmax[1:]
+    target_seasons[:-1] = [SEASONS[month] for month in months[1:]]
+
+    valid = ~np.isnan(features).any(axis=1)
+    return features, targets, target_seasons, valid
+
+
+def _init_worker(model_dir):
+    global _worker_models
+    _worker_models = pm.load_models(model_dir)
+
+
+# Function to score one chunk of the history in a worker process
+# Returns error sums per (model, sample, season) so chunks can be merged exactly
+def _score_chunk(args):
+    model_names, features, targets, seasons, samples = args
+    predictions = pm.predict_all_models(_worker_models, features, model_names=model_names)
+
+    sums = {}
+    for model_name, predicted in predictions.items():
+        error = predicted - targets
+        has_target = ~np.isnan(error)
+        for sample, season in set(zip(samples[has_target], seasons[has_target])):
+            selected = has_target & (samples == sample) & (seasons == season)
+            key = (model_name, sample, season)
+            count, abs_sum, sq_sum = sums.get(key, (0, 0.0, 0.0))
+            sums[key] = (count + int(selected.sum()),
+                         abs_sum + float(np.abs(error[selected]).sum()),
+                         sq_sum + float((error[selected] ** 2).sum()))
+    return sums
+
+
+# Function to turn merged error sums into next-day MAE/RMSE rows, with an all-season row per model and sample
+def summarize(sums):
+    totals = dict(sums)
+    for (model_name, sample, season), (count, abs_sum, sq_sum) in sums.items():
+        key = (model_name, sample, 'All')
+        total = totals.get(key, (0, 0.0, 0.0))
+        totals[key] = (total[0] + count, total[1] + abs_sum, total[2] + sq_sum)
+
+    return [
+        {'model': model_name, 'sample': sample, 'season': season, 'count': count,
+         'mae': abs_sum / count, 'rmse': (sq_sum / count) ** 0.5}
+        for (model_name, sample, season), (count, abs_sum, sq_sum) in sorted(totals.items())
+        if count
+    ]
+
+
+# Function to score the fixed model artifacts over the full history
+# This is not a walk-forward evaluation: the models are not refitted. Rows up to the training
+# cutoff in the manifest are reported as in-sample and only later rows as out-of-sample.
+# The history is cut into chunks of `window` days only to spread the scoring across processes.
+# Models whose artifacts are unchanged since the last run are served from the cache
+def run_backtest(data_file=DATA_FILE, model_dir=None, window=WINDOW_DAYS,
+                 workers=None, cache_dir=CACHE_DIR, force=False):
+    model_dir = model_dir or pm.resolve_model_dir()
+    data_hash = pm.file_sha256(data_file)
+    data, _ = ws.load_weather_data(data_file)
+    cutoff = training_cutoff(model_dir, data)
+    results, to_score, digests = [], [], {}
+    for model_name in pm.MODEL_PREDICTORS:
+        digests[model_name] = model_hash(model_name, model_dir, data_hash, window, cutoff)
+        path = cache_path(cache_dir, model_name, digests[model_name])
+        if not force and os.path.exists(path):
+            with open(path) as f:
+                results.extend(json.load(f))
+            logger.info("%s unchanged, using cached scores", model_name)
+        else:
+            to_score.append(model_name)
+
+    if not to_score:
+        return results
+
+    features, targets, seasons, valid = prepare(data)
+    samples = sample_labels(data.index, cutoff)
+    logger.info("Training cutoff: %s", cutoff.date() if cutoff is not None else "unknown (no manifest)")
+    tasks = []
+    for start in range(0, len(data), window):
+        rows = np.flatnonzero(valid[start:start + window]) + start
+        if len(rows):
+            tasks.append((to_score, features[rows], targets[rows], seasons[rows], samples[rows]))
+    logger.info("Scoring %s over %d chunks", ', '.join(to_score), len(tasks))
+
+    merged = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model_dir,)) as pool:
+        for sums in pool.map(_score_chunk, tasks):
+            for key, (count, abs_sum, sq_sum) in sums.items():
+                total = merged.get(key, (0, 0.0, 0.0))
+                merged[key] = (total[0] + count, total[1] + abs_sum, total[2] + sq_sum)
+
+    scored = summarize(merged)
+    os.makedirs(cache_dir, exist_ok=True)
+    for model_name in to_score:
+        rows = [row for row in scored if row['model'] == model_name]
+        with open(cache_path(cache_dir, model_name, digests[model_name]), 'w') as f:
+            json.dump(rows, f, indent=2)
+        results.extend(rows)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Next-day backtest of the LSTM, XGBoost and Ridge models, split into in-sample and out-of-sample rows.")
+    parser.add_argument('--data', default=DATA_FILE)
+    parser.add_argument('--model-dir', default=None, help="Artifact directory (default: the latest trained version)")
+    parser.add_argument('--window', type=int, default=WINDOW_DAYS, help="Days per chunk scored by one worker")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--force', action='store_true', help="Rescore every model, ignoring the cache")
+    parser.add_argument('--output', default=None, help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    results = run_backtest(args.data, args.model_dir, args.window, args.workers, args.cache_dir, args.force)
+
+    table = pd.DataFrame(results)
+    print("Next-day tmax error (°C) by sample and season (in-sample rows were seen in training):")
+    print(table.pivot_table(index=['sample', 'season'], columns='model', values=['mae', 'rmse']).round(3))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+from openmeteo_sdk.Variable import Variable
+import weather_schema as ws
+from forecast_archive import ReplayHourly, ReplayResponse, ReplayVariable
+
+# Variables of the forecast page as (Variable, altitude) pairs
+FORECAST_VARIABLES = [
+    (Variable.temperature, 2),
+    (Variable.weather_code, 0),
+    (Variable.relative_humidity, 2),
+    (Variable.wind_speed, 10),
+]
+
+WEATHER_CODES = np.array([0, 1, 2, 3, 45, 51, 53, 61, 63, 65, 80, 95], dtype=np.float32)
+WEATHER_DESCRIPTIONS = ["Clear", "Partly Cloudy", "Mainly Sunny", "Drizzle", "Light Rain",
+                        "Cloudy", "Rain", "Heavy Drizzle", "Sunny", "Heavy Rain"]
+
+
+# Function to generate member arrays for one variable
+def _member_values(rng, variable, hours):
+    if variable == Variable.temperature:
+        base = 25 + 5 * np.sin(np.arange(hours) * 2 * np.pi / 24)
+        return (base + rng.normal(0, 1.5, hours)).astype(np.float32)
+    if variable == Variable.weather_code:
+        return rng.choice(WEATHER_CODES, hours)
+    if variable == Variable.relative_humidity:
+        return rng.uniform(40, 100, hours).astype(np.float32)
+    return rng.gamma(2.0, 4.0, hours).astype(np.float32)
+
+
+# Function to generate Open-Meteo-shaped responses for N sites x M members x H hours
+def ensemble_responses(sites, members, hours, seed=0, start=1_700_000_000):
+    rng = np.random.default_rng(seed)
+    responses = []
+    for site in range(sites):
+        variables = [
+            ReplayVariable(variable, altitude, member, _member_values(rng, variable, hours))
+            for variable, altitude in FORECAST_VARIABLES
+            for member in range(members)
+        ]
+        latitude = -60 + 120 * rng.random()
+        longitude = -180 + 360 * rng.random()
+        responses.append(ReplayResponse(latitude, longitude, 0.0, ReplayHourly(start, 3600, hours, variables)))
+    return responses
+
+
+# Function to generate a dataset/data.csv-shaped history of the given length in days
+def weather_history(days, seed=0, start="1940-01-01"):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start=start, periods=days, freq="D", name="date")
+    season = np.sin(np.arange(days) * 2 * np.pi / 365.25)
+    data = {
+        "weather_code": rng.choice(WEATHER_DESCRIPTIONS, days),
+    }
+    for column in ws.MEASUREMENT_COLUMNS:
+        data[column] = 25 + 5 * season + rng.normal(0, 2, days)
+    return pd.DataFrame(data, index=dates)
+
+
+# Function to write a synthetic history to a CSV file the EDA loaders can read
+def write_weather_history(path, days, seed=0):
+    weather_history(days, seed=seed).to_csv(path)
+    return path
+
+
+# Function to generate a pre-warm index of the given number of sites with popups
+def site_index(count, seed=0):
+    rng = np.random.default_rng(seed)
+    sites = {}
+    for i in range(count):
+        latitude, longitude = -60 + 120 * rng.random(), -180 + 360 * rng.random()
+        popup = f"<b>Site {i}</b>" + "".join(f"<br>Day {day}: {rng.integers(15, 40)}°C ☀️ Sunny" for day in range(7))
+        sites[f"{latitude:.4f}_{longitude:.4f}"] = {
+            'name': f"Site {i}", 'latitude': latitude, 'longitude': longitude,
+            'fetched_at': '2024-01-01T00:00:00+00:00', 'popup': popup,
+        }
+    return sites
@@ -0,0 +1,204 @@
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+from datetime import datetime, timezone
+import numpy as np
+import forecast_pipeline as fp
+import weather_schema as ws
+from benchmarks import fixtures
+
+# Scales for each suite, as (sites, members, hours) / rows / days
+FORECAST_SCALES = [(1, 31, 168), (10, 31, 168), (1, 51, 384), (50, 51, 168)]
+PREDICTION_ROWS = [1, 10, 100, 1000, 10000]
+SWEEP_POINTS = [10, 100]  # Points per axis of the two-feature sweep
+SINGLE_ROW_LIMIT = 100  # Row-by-row inference is only timed up to this many rows
+HISTORY_DAYS = [365, 3650, 31000, 100000]
+MAP_SITES = [10, 100, 1000, 5000]
+
+QUICK_FORECAST_SCALES = [(1, 31, 168)]
+QUICK_PREDICTION_ROWS = [1, 100]
+QUICK_HISTORY_DAYS = [3650]
+QUICK_MAP_SITES = [100]
+
+
+# Function to time a callable, running setup outside the timed region
+def measure(func, setup=None, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return {
+        'repeat': repeat,
+        'best_s': min(timings),
+        'mean_s': sum(timings) / len(timings),
+        'max_s': max(timings),
+    }
+
+
+def record(results, suite, name, params, timing, **extra):
+    entry = {'suite': suite, 'name': name, 'params': params, **timing, **extra}
+    results.append(entry)
+    print(f"{suite:<10} {name:<28} {json.dumps(params):<48} best {timing['best_s'] * 1000:10.3f} ms")
+
+
+# Ensemble decode, member reduction and daily aggregation
+def run_forecast_suite(results, scales, repeat):
+    for sites, members, hours in scales:
+        params = {'sites': sites, 'members': members, 'hours': hours}
+        responses = fixtures.ensemble_responses(sites, members, hours)
+        decoded = [fp.decode_hourly(response) for response in responses]
+        reduced = [fp.reduce_members(df.copy()) for df in decoded]
+
+        record(results, 'forecast', 'decode', params, measure(
+            lambda: [fp.decode_hourly(response) for response in responses], repeat=repeat))
+        record(results, 'forecast', 'reduce', params, measure(
+            lambda frames: [fp.reduce_members(df) for df in frames],
+            setup=lambda: ([df.copy() for df in decoded],), repeat=repeat))
+        record(results, 'forecast', 'daily_aggregation', params, measure(
+            lambda: [fp.daily_summary(df) for df in reduced], repeat=repeat))
+
+
+# Model loading plus single-row versus batched inference over the bundled models
+def run_prediction_suite(results, rows_list, repeat, model_dir):
+    import prediction_models as pm
+
+    model_dir = model_dir or pm.resolve_model_dir()
+    record(results, 'prediction', 'load_models', {'model_dir': model_dir},
+           measure(lambda: pm.load_models(model_dir), repeat=1))
+    models = pm.load_models(model_dir)
+
+    rng = np.random.default_rng(0)
+    for rows in rows_list:
+        data = rng.uniform(0, 100, (rows, len(pm.feature_names)))
+        params = {'rows': rows}
+        record(results, 'prediction', 'predict_batched', params,
+               measure(lambda: pm.predict_all_models(models, data), repeat=repeat))
+        if rows <= SINGLE_ROW_LIMIT:
+            record(results, 'prediction', 'predict_single_row', params, measure(
+                lambda: [pm.predict_all_models(models, row[np.newaxis, :]) for row in data], repeat=repeat))
+
+    # Two-feature sensitivity sweep as used by the prediction page
+    base_row = np.full(len(pm.feature_names), 30.0)
+    for points in SWEEP_POINTS:
+        values = np.linspace(0, 100, points)
+        record(results, 'prediction', 'sweep_2d', {'grid': points * points}, measure(
+            lambda: pm.sweep(models, base_row, 'tmin', values, 'prec_sum', values), repeat=repeat))
+
+
+# Historical dataset loading and the aggregations of the EDA pages
+def run_eda_suite(results, days_list, repeat, work_dir):
+    for days in days_list:
+        path = fixtures.write_weather_history(os.path.join(work_dir, f'data_{days}.csv'), days)
+        params = {'days': days}
+        data, memory = ws.load_weather_data(path, calendar=True)
+        mask = ws.rain_mask(data)
+        numeric = data.drop(columns=['weather_code'])
+
+        memory['raw_mb'] = ws.raw_memory_usage_mb(path)
+        record(results, 'eda', 'load_data', {**params, **memory},
+               measure(lambda: ws.load_weather_data(path, calendar=True), repeat=repeat))
+        record(results, 'eda', 'rain_months', params, measure(
+            lambda: data.loc[mask, ['year', 'month']].groupby(['year', 'month']).size(), repeat=repeat))
+        record(results, 'eda', 'describe', params, measure(lambda: numeric.describe(), repeat=repeat))
+        record(results, 'eda', 'correlation', params, measure(lambda: numeric.corr(), repeat=repeat))
+        record(results, 'eda', 'monthly_resample', params, measure(
+            lambda: numeric.resample('MS').mean(), repeat=repeat))
+
+
+# Function to measure what st_folium sends to the browser on one rerun, in bytes
+# Mirrors the component arguments st_folium builds: map HTML, header, script and feature groups
+def rerun_payload_bytes(m, layers):
+    from streamlit_folium import _get_feature_group_string, _get_header, _get_html, _get_map_string
+
+    html = _get_html(m)
+    header = _get_header(m)
+    script = _get_map_string(m)
+    feature_groups = ''.join(_get_feature_group_string(layer, map=m, idx=idx) for idx, layer in enumerate(layers))
+    return sum(len(part.encode()) for part in (html, header, script, feature_groups))
+
+
+# Site layer export and the per-rerun map payload for many monitored sites
+# The payload of a map click should stay flat as the site count grows
+def run_map_suite(results, site_counts, repeat, work_dir):
+    import map_layer as ml
+
+    for count in site_counts:
+        sites = fixtures.site_index(count)
+        params = {'sites': count}
+        static_dir = os.path.join(work_dir, f'sites_{count}')
+
+        path = ml.export_site_layer(sites, static_dir)
+        record(results, 'map', 'export_site_layer', params,
+               measure(lambda: ml.export_site_layer(sites, static_dir), repeat=repeat),
+               geojson_bytes=os.path.getsize(path))
+
+        def rerun():
+            m = ml.base_map(f"{ml.STATIC_URL}sites.geojson?v=0")
+            return rerun_payload_bytes(m, [ml.selection_layer(11.9, 79.8, "Selected Location")])
+
+        record(results, 'map', 'rerun_payload', params, measure(rerun, repeat=repeat), payload_bytes=rerun())
+
+
+# Function to print the change against an earlier result file
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(r['suite'], r['name'], json.dumps(r['params'], sort_keys=True)): r for r in baseline['results']}
+
+    print(f"\nComparison against {baseline_path}:")
+    for entry in results:
+        key = (entry['suite'], entry['name'], json.dumps(entry['params'], sort_keys=True))
+        if key in previous:
+            ratio = entry['best_s'] / previous[key]['best_s']
+            print(f"{entry['suite']:<10} {entry['name']:<28} {json.dumps(entry['params']):<48} x{ratio:6.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the forecast, prediction and EDA hot paths.")
+    parser.add_argument('--suite', nargs='+', choices=['forecast', 'prediction', 'eda', 'map'],
+                        default=['forecast', 'prediction', 'eda', 'map'])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--quick', action='store_true', help="Run only the smallest scale of each suite")
+    parser.add_argument('--model-dir', default=None, help="Artifact directory (default: the latest trained version)")
+    parser.add_argument('--output', default=None, help="JSON result file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument('--compare', default=None, help="Earlier JSON result file to compare against")
+    args = parser.parse_args()
+
+    started = datetime.now(timezone.utc)
+    results = []
+    if 'forecast' in args.suite:
+        run_forecast_suite(results, QUICK_FORECAST_SCALES if args.quick else FORECAST_SCALES, args.repeat)
+    if 'prediction' in args.suite:
+        run_prediction_suite(results, QUICK_PREDICTION_ROWS if args.quick else PREDICTION_ROWS,
+                             args.repeat, args.model_dir)
+    if 'eda' in args.suite:
+        with tempfile.TemporaryDirectory() as work_dir:
+            run_eda_suite(results, QUICK_HISTORY_DAYS if args.quick else HISTORY_DAYS, args.repeat, work_dir)
+    if 'map' in args.suite:
+        with tempfile.TemporaryDirectory() as work_dir:
+            run_map_suite(results, QUICK_MAP_SITES if args.quick else MAP_SITES, args.repeat, work_dir)
+
+    output = args.output or os.path.join('benchmarks', 'results', f"{started.strftime('%Y%m%dT%H%M%SZ')}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            'started': started.isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'results': results,
+        }, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+import uuid
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+import forecast_pipeline as fp
+
+ARCHIVE_DIR = os.environ.get('WEATHERWAVE_ARCHIVE', '.archive')
+REPLAY = os.environ.get('WEATHERWAVE_REPLAY', '') not in ('', '0', 'false')
+MATCH_TOLERANCE = 0.05  # Degrees between a requested point and an archived site
+SITE_DECIMALS = 4  # Precision at which an archived site counts as the same site
+
+logger = logging.getLogger('forecast_archive')
+
+
+def run_label(run_time):
+    return run_time.strftime('%Y%m%dT%H%MZ')
+
+
+# Function to floor a fetch time to the hour, used as the run time of a fetch
+# The ensemble API does not report model initialisation times
+def fetch_run_time(now=None):
+    now = now or datetime.now(timezone.utc)
+    return now.replace(minute=0, second=0, microsecond=0)
+
+
+# A stored run: metadata plus the (site, variable, member, time) array, memory-mapped read-only
+class ArchivedRun:
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.array = np.load(os.path.join(directory, 'members.npy'), mmap_mode='r')
+
+    @property
+    def model(self):
+        return self.meta['model']
+
+    @property
+    def run_time(self):
+        return datetime.fromisoformat(self.meta['run_time'])
+
+    @property
+    def variables(self):
+        return self.meta['variables']
+
+    def times(self):
+        return pd.date_range(
+            start=pd.to_datetime(self.meta['time_start'], unit="s", utc=True),
+            periods=self.array.shape[-1],
+            freq=pd.Timedelta(seconds=self.meta['interval']),
+        )
+
+    def site_index(self, latitude, longitude, tolerance=MATCH_TOLERANCE):
+        distances = [math.hypot(site['latitude'] - latitude, site['longitude'] - longitude)
+                     for site in self.meta['sites']]
+        best = int(np.argmin(distances))
+        return best if distances[best] <= tolerance else None
+
+    def response(self, site_index):
+        return replay_response(self, site_index)
+
+
+# Stand-ins for the Open-Meteo FlatBuffer accessors, built from in-memory arrays
+# They let forecast_pipeline.summarize_response run unchanged on archived, interpolated or synthetic data
+class ReplayVariable:
+    def __init__(self, variable, altitude, member, values):
+        self._variable = variable
+        self._altitude = altitude
+        self._member = member
+        self._values = values
+
+    def Variable(self):
+        return self._variable
+
+    def Altitude(self):
+        return self._altitude
+
+    def EnsembleMember(self):
+        return self._member
+
+    def ValuesAsNumpy(self):
+        return self._values
+
+
+class ReplayHourly:
+    def __init__(self, time_start, interval, n_times, variables):
+        self._time_start = time_start
+        self._interval = interval
+        self._n_times = n_times
+        self._variables = variables
+
+    def Time(self):
+        return self._time_start
+
+    def TimeEnd(self):
+        return self._time_start + self._n_times * self._interval
+
+    def Interval(self):
+        return self._interval
+
+    def VariablesLength(self):
+        return len(self._variables)
+
+    def Variables(self, i):
+        return self._variables[i]
+
+
+class ReplayResponse:
+    def __init__(self, latitude, longitude, elevation, hourly):
+        self._latitude = latitude
+        self._longitude = longitude
+        self._elevation = elevation
+        self._hourly = hourly
+
+    def Latitude(self):
+        return self._latitude
+
+    def Longitude(self):
+        return self._longitude
+
+    def Elevation(self):
+        return self._elevation
+
+    def Hourly(self):
+        return self._hourly
+
+
+# Function to serve one site of a run (anything with meta and a (site, variable, member, time) array) as a response
+def replay_response(run, site_index):
+    variables = []
+    for v, name in enumerate(run.variables):
+        variable, altitude = fp.VARIABLE_IDS[name]
+        for member in range(run.array.shape[2]):
+            values = run.array[site_index, v, member]
+            if not np.isnan(values).all():
+                variables.append(ReplayVariable(variable, altitude or 0, member, values))
+    hourly = ReplayHourly(run.meta['time_start'], run.meta['interval'], run.array.shape[-1], variables)
+    site = run.meta['sites'][site_index]
+    return ReplayResponse(site['latitude'], site['longitude'], site['elevation'], hourly)
+
+
+def site_key(latitude, longitude):
+    return round(latitude, SITE_DECIMALS), round(longitude, SITE_DECIMALS)
+
+
+# Function to fingerprint the data of a response: its hourly time axis and every member series
+# A response served again from requests_cache has the same fingerprint, whatever the fetch time
+def response_digest(response):
+    hourly = response.Hourly()
+    digest = hashlib.sha1(f"{hourly.Time()}|{hourly.Interval()}".encode())
+    for i in range(hourly.VariablesLength()):
+        variable = hourly.Variables(i)
+        digest.update(f"|{variable.Variable()}|{variable.Altitude()}|{variable.EnsembleMember()}|".encode())
+        digest.update(np.ascontiguousarray(variable.ValuesAsNumpy()).tobytes())
+    return digest.hexdigest()
+
+
+# Archive of decoded ensemble runs, one directory per (model, run time, batch)
+# Layout: <root>/<model>/<run label>/<batch id>/members.npy + meta.json, indexed by <root>/index.jsonl
+# The index is append-only JSON lines, so concurrent sessions never rewrite each other's entries
+class ForecastArchive:
+    def __init__(self, directory=ARCHIVE_DIR):
+        self.directory = directory
+        self.index_path = os.path.join(directory, 'index.jsonl')
+        self._lock = threading.Lock()
+        self._index = []
+        self._offset = 0
+        self._archived = set()  # (model, site key, response digest) already in the index
+
+    # Function to return the index entries, reading only the lines appended since the last call
+    def index(self):
+        with self._lock:
+            try:
+                with open(self.index_path, 'rb') as f:
+                    f.seek(self._offset)
+                    chunk = f.read()
+            except OSError:
+                return self._index
+            end = chunk.rfind(b'\n') + 1  # Leave a line still being written for the next call
+            for line in chunk[:end].splitlines():
+                if line.strip():
+                    entry = json.loads(line)
+                    self._index.append(entry)
+                    self._archived.update((entry['model'], site_key(lat, lon), digest)
+                                          for (lat, lon), digest in zip(entry['sites'], entry.get('digests', [])))
+            self._offset += end
+            return self._index
+
+    def is_archived(self, model, latitude, longitude, digest):
+        self.index()
+        return (model, site_key(latitude, longitude), digest) in self._archived
+
+    def _append_index(self, entry):
+        line = (json.dumps(entry) + '\n').encode()
+        with self._lock:
+            # One write in append mode, so lines from concurrent writers never interleave
+            with open(self.index_path, 'ab') as f:
+                f.write(line)
+
+    # Function to store the responses of one model run for one or more sites
+    def record(self, model, responses, run_time=None, digests=None):
+        run_time = run_time or fetch_run_time()
+        digests = digests or [response_digest(response) for response in responses]
+        decoded = [fp.decode_member_array(response) for response in responses]
+        n_members = max(item['array'].shape[1] for item in decoded)
+        n_times = max(item['array'].shape[2] for item in decoded)
+        shape = (len(decoded), len(decoded[0]['variables']), n_members, n_times)
+
+        directory = os.path.join(self.directory, model, run_label(run_time), uuid.uuid4().hex)
+        os.makedirs(directory)
+
+        array = np.lib.format.open_memmap(os.path.join(directory, 'members.npy'), mode='w+',
+                                          dtype=np.float32, shape=shape)
+        array[:] = np.nan
+        for site, item in enumerate(decoded):
+            _, members, times = item['array'].shape
+            array[site, :, :members, :times] = item['array']
+        array.flush()
+        del array
+
+        sites = [{'latitude': response.Latitude(), 'longitude': response.Longitude(),
+                  'elevation': response.Elevation()} for response in responses]
+        meta = {
+            'model': model,
+            'run_time': run_time.isoformat(),
+            'time_start': decoded[0]['time_start'],
+            'interval': decoded[0]['interval'],
+            'variables': decoded[0]['variables'],
+            'shape': list(shape),
+            'sites': sites,
+        }
+        with open(os.path.join(directory, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+        self._append_index({
+            'path': os.path.relpath(directory, self.directory),
+            'model': model,
+            'run_time': meta['run_time'],
+            'sites': [[site['latitude'], site['longitude']] for site in sites],
+            'digests': digests,
+        })
+        return directory
+
+    # Function to record the responses of a fetch, one run per model
+    # models gives the model of each response; by default a single-location ensemble fetch,
+    # whose responses come back in the order of the requested models.
+    # Sites whose data is already archived for the same model (e.g. requests_cache hits) are
+    # skipped before decoding, and failures are logged so archiving never breaks a forecast
+    def record_fetch(self, responses, models=fp.ENSEMBLE_MODELS, run_time=None):
+        run_time = run_time or fetch_run_time()
+        by_model = {}
+        for model, response in zip(models, responses):
+            digest = response_digest(response)
+            if not self.is_archived(model, response.Latitude(), response.Longitude(), digest):
+                model_responses, digests = by_model.setdefault(model, ([], []))
+                model_responses.append(response)
+                digests.append(digest)
+
+        directories = []
+        for model, (model_responses, digests) in by_model.items():
+            try:
+                directories.append(self.record(model, model_responses, run_time=run_time, digests=digests))
+            except Exception:
+                logger.exception("Archiving %s run %s failed", model, run_label(run_time))
+        return directories
+
+    # Function to list archived runs covering a point, newest first
+    def runs(self, latitude, longitude, model=None, tolerance=MATCH_TOLERANCE):
+        matches = [
+            entry for entry in self.index()
+            if (model is None or entry['model'] == model)
+            and any(math.hypot(lat - latitude, lon - longitude) <= tolerance for lat, lon in entry['sites'])
+        ]
+        return sorted(matches, key=lambda entry: entry['run_time'], reverse=True)
+
+    def load(self, entry):
+        return ArchivedRun(os.path.join(self.directory, entry['path']))
+
+    # Function to load the newest archived run for a point as a replay response
+    def replay(self, latitude, longitude, model=fp.ENSEMBLE_MODELS[0], run_time=None, tolerance=MATCH_TOLERANCE):
+        for entry in self.runs(latitude, longitude, model=model, tolerance=tolerance):
+            if run_time is not None and entry['run_time'] != run_time.isoformat():
+                continue
+            run = self.load(entry)
+            site_index = run.site_index(latitude, longitude, tolerance)
+            if site_index is not None:
+                return run.response(site_index)
+        return None
@@ -0,0 +1,184 @@
+import numpy as np
+import requests
+import requests_cache
+import pandas as pd
+from openmeteo_requests import Client, OpenMeteoRequestsError
+from openmeteo_sdk.Variable import Variable
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import weather_code_decoder as wcd
+from instrumentation import span, timed
+
+ENSEMBLE_URL = "https://ensemble-api.open-meteo.com/v1/ensemble"
+DEFAULT_COORDINATES = (11.9338, 79.8298)
+
+HOURLY_VARIABLES = ["temperature_2m", "weather_code", "relative_humidity_2m", "wind_speed_10m"]  # Add extra weather variables here
+ENSEMBLE_MODELS = ["icon_seamless", "icon_global", "icon_eu", "icon_d2", "gfs_seamless", "gfs025", "gfs05",
+                   "ecmwf_ifs04", "ecmwf_ifs025", "gem_global", "bom_access_global_ensemble"]
+FORECAST_DAYS = 7
+
+# Open-Meteo variable and altitude for each hourly variable, None where altitude is not checked
+VARIABLE_IDS = {
+    "temperature_2m": (Variable.temperature, 2),
+    "weather_code": (Variable.weather_code, None),
+    "relative_humidity_2m": (Variable.relative_humidity, 2),
+    "wind_speed_10m": (Variable.wind_speed, 10),
+}
+
+# Errors a fetch can raise: network failures, exhausted retries (e.g. repeated 429s) and API error bodies
+FETCH_ERRORS = (requests.RequestException, OpenMeteoRequestsError)
+
+# Function to setup retry mechanism
+def setup_retry(session, retries, backoff_factor):
+    retry_strategy = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["HEAD", "GET", "OPTIONS"]
+    )
+    adapter = HTTPAdapter(max_retries=retry_strategy)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+# Function to build a cached, retrying Open-Meteo client
+# Pass cache_name=None for an uncached client that always hits the API
+def build_client(cache_name='.cache', expire_after=3600):
+    if cache_name is None:
+        session = requests.Session()
+    else:
+        session = requests_cache.CachedSession(cache_name, expire_after=expire_after)
+    retry_session = setup_retry(session, retries=5, backoff_factor=0.2)
+    return Client(session=retry_session)
+
+# Function to build the ensemble API parameters for one or more locations
+def ensemble_params(latitude, longitude):
+    return {
+        "latitude": latitude,
+        "longitude": longitude,
+        "hourly": HOURLY_VARIABLES,
+        "forecast_days": FORECAST_DAYS,
+        "models": ENSEMBLE_MODELS
+    }
+
+# Function to fetch the ensemble forecast responses for a location
+def fetch_ensemble(latitude, longitude, client=None, url=ENSEMBLE_URL):
+    client = client or build_client()
+    with span("open_meteo_fetch"):
+        return client.weather_api(url, params=ensemble_params(latitude, longitude))
+
+# Function to decode the hourly member arrays of a response into a DataFrame
+@timed("decode")
+def decode_hourly(response):
+    hourly = response.Hourly()
+    hourly_data = {
+        "date": pd.date_range(
+            start=pd.to_datetime(hourly.Time(), unit="s", utc=True),
+            end=pd.to_datetime(hourly.TimeEnd(), unit="s", utc=True),
+            freq=pd.Timedelta(seconds=hourly.Interval()),
+            inclusive="left"
+        )
+    }
+
+    for i in range(hourly.VariablesLength()):
+        variable = hourly.Variables(i)
+        member = variable.EnsembleMember()
+        values = variable.ValuesAsNumpy()
+        if variable.Variable() == Variable.temperature and variable.Altitude() == 2:
+            hourly_data[f"temperature_2m_member{member}"] = values
+        elif variable.Variable() == Variable.weather_code:
+            hourly_data[f"weather_code_member{member}"] = values
+        elif variable.Variable() == Variable.relative_humidity and variable.Altitude() == 2:  # Add extra conditions for additional weather variables
+            hourly_data[f"relative_humidity_2m_member{member}"] = values
+        elif variable.Variable() == Variable.wind_speed and variable.Altitude() == 10:  # Assuming wind speed is measured at 10m height
+            hourly_data[f"wind_speed_10m_member{member}"] = values
+            # Add more conditions for other weather variables as needed
+
+    df = pd.DataFrame(data=hourly_data)
+    df.set_index('date', inplace=True)
+    return df
+
+# Function to decode a response into a (variable, member, time) float32 array
+# Members missing for a variable are left as NaN
+def decode_member_array(response, variables=HOURLY_VARIABLES):
+    hourly = response.Hourly()
+    n_times = int((hourly.TimeEnd() - hourly.Time()) // hourly.Interval())
+    lookup = {VARIABLE_IDS[name]: index for index, name in enumerate(variables)}
+
+    decoded = []
+    for i in range(hourly.VariablesLength()):
+        variable = hourly.Variables(i)
+        index = lookup.get((variable.Variable(), variable.Altitude()), lookup.get((variable.Variable(), None)))
+        if index is not None:
+            decoded.append((index, variable.EnsembleMember(), variable.ValuesAsNumpy()))
+
+    n_members = max((member for _, member, _ in decoded), default=-1) + 1
+    array = np.full((len(variables), n_members, n_times), np.nan, dtype=np.float32)
+    for index, member, values in decoded:
+        array[index, member, :] = values
+    return {
+        'time_start': hourly.Time(),
+        'interval': hourly.Interval(),
+        'variables': list(variables),
+        'array': array,
+    }
+
+# Define a function to find the mode for each row
+def row_mode(series):
+    return series.mode().iloc[0] if not series.mode().empty else None
+
+# Function to reduce the ensemble members to max/min/mean columns
+@timed("reduce")
+def reduce_members(df):
+    # Create columns for max_temp, max_weather_code, max_relative_humidity, max_wind_speed
+    df['max_temp'] = df[[col for col in df.columns if 'temperature_2m' in col]].max(axis=1)
+    df['min_temp'] = df[[col for col in df.columns if 'temperature_2m' in col]].min(axis=1)
+    df['mean_temp'] = df[['max_temp', 'min_temp']].mean(axis=1)
+    df['max_relative_humidity'] = df[[col for col in df.columns if 'relative_humidity_2m' in col]].max(axis=1)
+    df['max_wind_speed'] = df[[col for col in df.columns if 'wind_speed_10m' in col]].max(axis=1)
+
+    # Apply the function to each row to find the most frequent weather code
+    weather_code_columns = [col for col in df.columns if 'weather_code' in col]
+    with span("row_mode"):
+        df['max_weather_code'] = df[weather_code_columns].apply(row_mode, axis=1)
+    return df
+
+# Function to aggregate the reduced hourly data into daily mean and max tables
+@timed("resample")
+def daily_summary(df):
+    # Calculate daily mean
+    daily_mean = df.resample('D').mean()
+    daily_mean = daily_mean.dropna()  # Drop rows with NaN values
+
+    # Calculate daily max
+    daily_max = df.resample('D').max()
+    daily_max = daily_max.dropna()
+
+    # Remove time component from index
+    daily_mean.index = daily_max.index.date
+    daily_max.index = daily_max.index.date
+
+    daily_max['weather_desc'] = daily_max['max_weather_code'].map(wcd.map_weather_codes)
+    return daily_mean, daily_max
+
+# Function to attach the hourly weather description used by the charts
+def describe_hourly(df):
+    df['max_weather_code'] = df[[col for col in df.columns if 'weather_code' in col]].max(axis=1)
+    df['weather_desc'] = df['max_weather_code'].map(wcd.map_weather_codes)
+    return df
+
+# Function to run the whole pipeline on one response
+# Returns the hourly frame and daily tables with the response metadata
+def summarize_response(response):
+    df = decode_hourly(response)
+    df = reduce_members(df)
+    daily_mean, daily_max = daily_summary(df)
+    df = describe_hourly(df)
+    return {
+        'latitude': response.Latitude(),
+        'longitude': response.Longitude(),
+        'elevation': response.Elevation(),
+        'hourly': df,
+        'daily_mean': daily_mean,
+        'daily_max': daily_max,
+    }
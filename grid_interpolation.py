@@ -0,0 +1,177 @@
+# Regional grid mode for the forecast page
+#
+# A coarse lattice of points covering a region is fetched once per model run in
+# batched requests and held in memory as a (lat, lon, variable, member, time)
+# array. Any point inside the region is then answered by interpolating between
+# the four surrounding lattice points, with no upstream request.
+#
+# Error bounds, for a lattice spacing h (degrees) and a field f:
+# - Bilinear, used for continuous fields (temperature, humidity, wind speed):
+#   |f - I(f)| <= (h_lat^2 * max|d2f/dlat2| + h_lon^2 * max|d2f/dlon2|) / 8.
+#   The bound is exact at lattice points and largest at cell centres. Smooth
+#   fields over flat terrain stay within a few tenths of a degree at 0.25-0.5°
+#   spacing. Coastlines, mountains and convective rain break the smoothness
+#   assumption and can exceed it.
+# - Nearest cell, used for weather_code (a category, so averaging is meaningless)
+#   and available for every field: |f - N(f)| <= (h / sqrt(2)) * max|grad f|.
+# The ensemble models themselves run on 0.25-1.0° grids. Spacings at or below the
+# native resolution mostly add interpolation noise on top of the API's own
+# grid-cell lookup. validate() measures the actual error against direct fetches
+# for a set of points. Run it when choosing the spacing for a new region.
+
+import numpy as np
+import forecast_pipeline as fp
+from forecast_archive import replay_response
+from prewarm import RateLimiter
+
+DEFAULT_BOUNDS = (8.0, 20.0, 72.0, 88.0)  # lat_min, lat_max, lon_min, lon_max
+DEFAULT_SPACING = 1.0  # Degrees
+LOCATIONS_PER_REQUEST = 50
+MAX_GRID_POINTS = 1000  # About 20 requests and under 100 MB of float32 members per grid
+CATEGORICAL_VARIABLES = ("weather_code",)
+
+
+# In-memory member arrays for a regional lattice from one model run
+class RegionalGrid:
+    def __init__(self, lats, lons, array, elevation, time_start, interval, variables, model):
+        self.lats = lats
+        self.lons = lons
+        self.array = array  # (lat, lon, variable, member, time)
+        self.elevation = elevation  # (lat, lon)
+        self.variables = variables
+        self.model = model
+        self.meta = {'time_start': time_start, 'interval': interval}
+
+    @property
+    def bounds(self):
+        return self.lats[0], self.lats[-1], self.lons[0], self.lons[-1]
+
+    def contains(self, latitude, longitude):
+        lat_min, lat_max, lon_min, lon_max = self.bounds
+        return lat_min <= latitude <= lat_max and lon_min <= longitude <= lon_max
+
+    # Function to find the cell of a point and its fractional position inside it
+    def _cell(self, latitude, longitude):
+        i = int(np.clip(np.searchsorted(self.lats, latitude) - 1, 0, len(self.lats) - 2))
+        j = int(np.clip(np.searchsorted(self.lons, longitude) - 1, 0, len(self.lons) - 2))
+        ty = (latitude - self.lats[i]) / (self.lats[i + 1] - self.lats[i])
+        tx = (longitude - self.lons[j]) / (self.lons[j + 1] - self.lons[j])
+        return i, j, ty, tx
+
+    # Function to interpolate the (variable, member, time) block at a point
+    def interpolate(self, latitude, longitude, method='bilinear'):
+        if not self.contains(latitude, longitude):
+            raise ValueError(f"({latitude}, {longitude}) is outside the grid bounds {self.bounds}")
+
+        i, j, ty, tx = self._cell(latitude, longitude)
+        nearest = self.array[i + int(round(ty)), j + int(round(tx))]
+        if method == 'nearest':
+            return nearest.copy()
+
+        corners = self.array[i:i + 2, j:j + 2]
+        weights = np.array([[(1 - ty) * (1 - tx), (1 - ty) * tx],
+                            [ty * (1 - tx), ty * tx]], dtype=np.float32)
+        block = np.tensordot(weights, corners, axes=([0, 1], [0, 1]))
+        for v, name in enumerate(self.variables):
+            if name in CATEGORICAL_VARIABLES:
+                block[v] = nearest[v]
+        return block
+
+    def interpolate_elevation(self, latitude, longitude):
+        i, j, ty, tx = self._cell(latitude, longitude)
+        corners = self.elevation[i:i + 2, j:j + 2]
+        return float((1 - ty) * ((1 - tx) * corners[0, 0] + tx * corners[0, 1])
+                     + ty * ((1 - tx) * corners[1, 0] + tx * corners[1, 1]))
+
+    # Function to serve a point as a response object for forecast_pipeline.summarize_response
+    def response(self, latitude, longitude, method='bilinear'):
+        return replay_response(_InterpolatedRun(self, latitude, longitude, method), 0)
+
+
+# Single-site run in the shape forecast_archive.replay_response reads
+class _InterpolatedRun:
+    def __init__(self, grid, latitude, longitude, method):
+        self.variables = grid.variables
+        self.array = grid.interpolate(latitude, longitude, method)[np.newaxis]
+        self.meta = {
+            **grid.meta,
+            'sites': [{'latitude': latitude, 'longitude': longitude,
+                       'elevation': grid.interpolate_elevation(latitude, longitude)}],
+        }
+
+
+def lattice(bounds=DEFAULT_BOUNDS, spacing=DEFAULT_SPACING):
+    lat_min, lat_max, lon_min, lon_max = bounds
+    lats = np.arange(lat_min, lat_max + spacing / 2, spacing)
+    lons = np.arange(lon_min, lon_max + spacing / 2, spacing)
+    if len(lats) < 2 or len(lons) < 2:
+        raise ValueError(f"Bounds {bounds} need at least two lattice points per axis at {spacing}° spacing")
+    if len(lats) * len(lons) > MAX_GRID_POINTS:
+        raise ValueError(f"Bounds {bounds} at {spacing}° spacing need {len(lats) * len(lons)} lattice points, "
+                         f"more than the limit of {MAX_GRID_POINTS}. Use a smaller region or a coarser spacing")
+    return lats, lons
+
+
+# Function to fetch the lattice for one model in batched multi-location requests
+# Batches are paced with the pre-warmer's rate limiter
+# Returns the grid and the raw responses, in row-major lattice order
+def fetch_grid(bounds=DEFAULT_BOUNDS, spacing=DEFAULT_SPACING, client=None, model=fp.ENSEMBLE_MODELS[0],
+               url=fp.ENSEMBLE_URL, chunk=LOCATIONS_PER_REQUEST, limiter=None):
+    client = client or fp.build_client()
+    limiter = limiter or RateLimiter()
+    lats, lons = lattice(bounds, spacing)
+    points = [(lat, lon) for lat in lats for lon in lons]
+
+    responses = []
+    for start in range(0, len(points), chunk):
+        batch = points[start:start + chunk]
+        params = fp.ensemble_params([float(lat) for lat, _ in batch], [float(lon) for _, lon in batch])
+        params['models'] = [model]
+        limiter.wait()
+        responses.extend(client.weather_api(url, params=params))
+
+    decoded = [fp.decode_member_array(response) for response in responses]
+    n_members = max(item['array'].shape[1] for item in decoded)
+    n_times = max(item['array'].shape[2] for item in decoded)
+    array = np.full((len(lats), len(lons), len(decoded[0]['variables']), n_members, n_times),
+                    np.nan, dtype=np.float32)
+    elevation = np.zeros((len(lats), len(lons)), dtype=np.float32)
+    for k, (item, response) in enumerate(zip(decoded, responses)):
+        i, j = divmod(k, len(lons))
+        _, members, times = item['array'].shape
+        array[i, j, :, :members, :times] = item['array']
+        elevation[i, j] = response.Elevation()
+
+    grid = RegionalGrid(lats, lons, array, elevation, decoded[0]['time_start'], decoded[0]['interval'],
+                        decoded[0]['variables'], model)
+    return grid, responses
+
+
+# Function to measure interpolation error against direct fetches for some points
+# Returns the mean and maximum absolute error per variable over members and hours,
+# and the share of mismatched hours for categorical variables
+def validate(grid, points, client=None, method='bilinear', url=fp.ENSEMBLE_URL):
+    client = client or fp.build_client()
+    errors = {name: [] for name in grid.variables}
+    for latitude, longitude in points:
+        params = fp.ensemble_params(latitude, longitude)
+        params['models'] = [grid.model]
+        direct = fp.decode_member_array(client.weather_api(url, params=params)[0])['array']
+        interpolated = grid.interpolate(latitude, longitude, method)
+        members = min(direct.shape[1], interpolated.shape[1])
+        times = min(direct.shape[2], interpolated.shape[2])
+        difference = np.abs(interpolated[:, :members, :times] - direct[:, :members, :times])
+        for v, name in enumerate(grid.variables):
+            errors[name].append(difference[v][~np.isnan(difference[v])])
+
+    report = {}
+    for name, chunks in errors.items():
+        values = np.concatenate(chunks) if chunks else np.array([])
+        if name in CATEGORICAL_VARIABLES:
+            report[name] = {'mismatch_rate': float((values != 0).mean()) if values.size else None}
+        else:
+            report[name] = {
+                'mae': float(values.mean()) if values.size else None,
+                'max': float(values.max()) if values.size else None,
+            }
+    return report
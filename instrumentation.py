@@ -0,0 +1,172 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+
+# Timing is off unless enabled per request or through the environment
+ENABLED_BY_DEFAULT = os.environ.get('WEATHERWAVE_TIMING', '') not in ('', '0', 'false')
+TIMING_LOG = os.environ.get('WEATHERWAVE_TIMING_LOG')  # JSON lines file, one record per request
+METRICS_FILE = os.environ.get('WEATHERWAVE_METRICS_FILE')  # Prometheus text exposition file
+
+_state = threading.local()
+_NULL_SPAN = nullcontext()
+
+# Per-stage totals across requests, for the Prometheus file
+_metrics_lock = threading.Lock()
+_stage_totals = {}
+
+
+class _Span:
+    __slots__ = ('name', 'spans', 'start', 'depth')
+
+    def __init__(self, name, spans):
+        self.name = name
+        self.spans = spans
+
+    def __enter__(self):
+        self.depth = getattr(_state, 'depth', 0)
+        _state.depth = self.depth + 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        _state.depth = self.depth
+        self.spans.append({
+            'stage': self.name,
+            'depth': self.depth,
+            'offset_s': self.start - _state.started,
+            'duration_s': duration,
+            'error': exc_type.__name__ if exc_type else None,
+        })
+        return False
+
+
+# Function to begin collecting spans for the current script run
+def start_request(page, enabled=None):
+    enabled = ENABLED_BY_DEFAULT if enabled is None else enabled
+    _state.page = page
+    _state.open = True
+    _state.spans = [] if enabled else None
+    _state.depth = 0
+    _state.started = time.perf_counter()
+
+
+# Function to time a stage of the current request
+# Returns a shared no-op context when timing is disabled
+def span(name):
+    spans = getattr(_state, 'spans', None)
+    if spans is None:
+        return _NULL_SPAN
+    return _Span(name, spans)
+
+
+# Decorator form of span for whole functions
+def timed(name):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# A request is open between start_request and finish_request of a full script run
+# Pages with fragments call finish_request in a finally block, so an interrupted run never leaves it open
+def in_request():
+    return getattr(_state, 'open', False)
+
+
+# Function to return the spans recorded so far in the current request
+def timings():
+    return list(getattr(_state, 'spans', None) or [])
+
+
+# Function to close the current request and write the log and metrics files
+def finish_request():
+    _state.open = False
+    spans = getattr(_state, 'spans', None)
+    if spans is None:
+        return None
+
+    record = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'page': _state.page,
+        'total_s': time.perf_counter() - _state.started,
+        'spans': spans,
+    }
+    if TIMING_LOG:
+        with open(TIMING_LOG, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+    if METRICS_FILE:
+        _update_metrics(record)
+    return record
+
+
+def _update_metrics(record):
+    with _metrics_lock:
+        for entry in record['spans']:
+            key = (record['page'], entry['stage'])
+            count, total = _stage_totals.get(key, (0, 0.0))
+            _stage_totals[key] = (count + 1, total + entry['duration_s'])
+
+        lines = [
+            '# HELP weatherwave_stage_seconds Time spent in each page stage.',
+            '# TYPE weatherwave_stage_seconds summary',
+        ]
+        for (page, stage), (count, total) in sorted(_stage_totals.items()):
+            labels = f'page="{page}",stage="{stage}"'
+            lines.append(f'weatherwave_stage_seconds_count{{{labels}}} {count}')
+            lines.append(f'weatherwave_stage_seconds_sum{{{labels}}} {total:.6f}')
+
+        # Write to a temporary file first so scrapers never read a partial file
+        tmp_path = f'{METRICS_FILE}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, METRICS_FILE)
+
+
+# Function to show the per-request timing panel, in the sidebar unless another container is given
+def render_timing_panel(record=None, container=None):
+    import streamlit as st
+
+    spans = record['spans'] if record else timings()
+    if not spans:
+        return
+    container = container or st.sidebar
+    with container.expander("Stage timings", expanded=True):
+        if record:
+            st.write(f"Total: {record['total_s'] * 1000:.1f} ms")
+        for entry in sorted(spans, key=lambda e: e['offset_s']):
+            indent = '\u2003' * entry['depth']
+            st.write(f"{indent}{entry['stage']}: {entry['duration_s'] * 1000:.1f} ms")
+
+
+# Function to add the timing toggle to a page and start the request
+def setup_page(page):
+    import streamlit as st
+
+    enabled = st.sidebar.checkbox("Show stage timings", value=ENABLED_BY_DEFAULT, key='show_stage_timings')
+    start_request(page, enabled=enabled)
+
+
+# Context for the body of a Streamlit fragment
+# During a full run it joins the page's request; on a fragment-only rerun it times
+# the fragment as its own request and shows the panel inline, since fragments
+# cannot write to the sidebar
+@contextmanager
+def fragment_request(page):
+    import streamlit as st
+
+    if in_request():
+        yield
+        return
+    start_request(page, enabled=st.session_state.get('show_stage_timings', ENABLED_BY_DEFAULT))
+    try:
+        yield
+    finally:
+        render_timing_panel(finish_request(), container=st)
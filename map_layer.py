@@ -0,0 +1,122 @@
+import json
+import os
+import tempfile
+import folium
+from folium.elements import JSCSSMixin
+from folium.plugins import MarkerCluster
+from jinja2 import Template
+import streamlit as st
+from streamlit_folium import st_folium
+import forecast_pipeline as fp
+
+# The site layer is exported as static files and served by Streamlit's static file serving
+# (server.enableStaticServing in .streamlit/config.toml), so the browser fetches it once
+# instead of receiving it with every rerun
+STATIC_DIR = os.path.join('static', 'sites')
+STATIC_URL = '/app/static/sites/'
+MAP_KEY = 'forecast_map'  # Session state key holding the map's latest value
+
+
+# Clustered marker layer that loads the site list from a GeoJSON URL in the browser
+# Popups are empty until opened, then fetch their precomputed summary
+class StaticSiteLayer(JSCSSMixin):
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        var {{ this.get_name() }} = L.markerClusterGroup().addTo({{ this._parent.get_name() }});
+        fetch({{ this.url|tojson }})
+            .then(function (response) { return response.json(); })
+            .then(function (data) {
+                var markers = data.features.map(function (feature) {
+                    var coordinates = feature.geometry.coordinates;
+                    var marker = L.marker([coordinates[1], coordinates[0]], {title: feature.properties.name});
+                    marker.bindPopup('Loading…', {maxWidth: 300});
+                    marker.once('popupopen', function () {
+                        fetch({{ this.popup_url|tojson }} + feature.properties.popup)
+                            .then(function (response) { return response.text(); })
+                            .then(function (html) { marker.setPopupContent(html); });
+                    });
+                    return marker;
+                });
+                {{ this.get_name() }}.addLayers(markers);
+            });
+        {% endmacro %}
+    """)
+
+    default_js = MarkerCluster.default_js
+    default_css = MarkerCluster.default_css
+
+    def __init__(self, url, popup_url):
+        super().__init__()
+        self._name = 'StaticSiteLayer'
+        self.url = url
+        self.popup_url = popup_url
+
+
+def popup_filename(key):
+    return f"{key}.html"
+
+
+# Function to replace a file through a uniquely named temporary file in the same directory
+# Concurrent exports from several sessions never share a temporary file
+def _write_atomic(path, text):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+# Function to write the pre-warm index as a GeoJSON point layer plus one popup file per site
+# The popups are written first and the GeoJSON replaced last, so readers never see missing popups
+def export_site_layer(sites, static_dir=STATIC_DIR):
+    popup_dir = os.path.join(static_dir, 'popups')
+    os.makedirs(popup_dir, exist_ok=True)
+    features = []
+    for key, site in sites.items():
+        _write_atomic(os.path.join(popup_dir, popup_filename(key)), site.get('popup') or site['name'])
+        features.append({
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [site['longitude'], site['latitude']]},
+            'properties': {'name': site['name'], 'popup': popup_filename(key)},
+        })
+
+    path = os.path.join(static_dir, 'sites.geojson')
+    _write_atomic(path, json.dumps({'type': 'FeatureCollection', 'features': features}, separators=(',', ':')))
+    return path
+
+
+# Function to re-export the site layer only when the pre-warm index changes
+# Returns the layer URL, versioned by the index time so browsers refetch after a refresh
+@st.cache_resource(max_entries=1)
+def site_layer_url(store_dir, index_mtime, _sites):
+    export_site_layer(_sites)
+    return f"{STATIC_URL}sites.geojson?v={int(index_mtime or 0)}"
+
+
+# Function to build the base map for one render
+# A fresh map per render keeps folium objects out of shared caches; its HTML is identical
+# between reruns, so the map component is not remounted
+def base_map(layer_url=None, zoom_start=5):
+    m = folium.Map(location=list(fp.DEFAULT_COORDINATES), zoom_start=zoom_start, prefer_canvas=True)
+    if layer_url:
+        StaticSiteLayer(layer_url, f"{STATIC_URL}popups/").add_to(m)
+    return m
+
+
+def selection_layer(lat, lon, popup_text):
+    layer = folium.FeatureGroup(name="Selected location")
+    folium.Marker(location=[lat, lon], draggable=True, popup=popup_text).add_to(layer)
+    return layer
+
+
+# Function to render the map with the monitored sites and the selected location
+# Only the selection marker is sent as a per-rerun feature group
+def render_map(lat, lon, popup_text, store, center=None, key=MAP_KEY, width=700, height=500):
+    sites = store.sites()
+    layer_url = site_layer_url(store.directory, store.index_mtime(), sites) if sites else None
+    return st_folium(base_map(layer_url), center=list(center or (lat, lon)),
+                     feature_group_to_add=selection_layer(lat, lon, popup_text),
+                     key=key, width=width, height=height)
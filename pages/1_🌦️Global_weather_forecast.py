@@ -1,188 +1,205 @@
+import time
 import streamlit as st
-import requests_cache
-import pandas as pd
-from openmeteo_requests import Client
-from openmeteo_sdk.Variable import Variable
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-from retry_requests import retry
-import folium
-from streamlit_folium import st_folium
 import geocoder
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+import forecast_pipeline as fp
+import instrumentation as inst
+import prewarm as pw
+import forecast_archive as fa
+import grid_interpolation as gi
+import map_layer as ml
 import weather_code_decoder as wcd
 import key as ky
 
-# Function to setup retry mechanism
-def setup_retry(session, retries, backoff_factor):
-    retry_strategy = Retry(
-        total=retries,
-        backoff_factor=0.2,
-        status_forcelist=[429, 500, 502, 503, 504],
-        allowed_methods=["HEAD", "GET", "OPTIONS"]
-    )
-    adapter = HTTPAdapter(max_retries=retry_strategy)
-    session.mount("http://", adapter)
-    session.mount("https://", adapter)
-    return session
+GEOCODE_TTL = 24 * 3600  # Seconds a geocoding result is reused
+FORECAST_TTL = 3600  # Seconds a reduced forecast is reused within a session
+MAX_SESSION_FORECASTS = 20
 
 # Function to get location name from coordinates
+@st.cache_data(ttl=GEOCODE_TTL, show_spinner=False)
 def get_location_name(latitude, longitude):
-    location_en = geocoder.opencage([latitude, longitude], key=ky.opencage, method='reverse', language='en')
+    with inst.span("reverse_geocoding"):
+        location_en = geocoder.opencage([latitude, longitude], key=ky.opencage, method='reverse', language='en')
     if location_en:
         return location_en.address
     else:
-        return None, None
+        return None
     
 # Function to get coordinates from a location name
+@st.cache_data(ttl=GEOCODE_TTL, show_spinner=False)
 def get_coordinates(location_name):
-    location = geocoder.opencage(location_name, key=ky.opencage)
+    with inst.span("geocoding"):
+        location = geocoder.opencage(location_name, key=ky.opencage)
     if location and location.latlng:
         return location.latlng[0], location.latlng[1]
     else:
         return None, None
 
-# Streamlit App
-def main():
-    st.set_page_config(page_title="Global Weather Forecast", page_icon="🌦️")
-    st.markdown("# Global Weather Forecast")
-    st.sidebar.header("Global Weather Forecast")
+# Function to open the pre-warmed summary store once per server process
+@st.cache_resource
+def get_summary_store():
+    return pw.SummaryStore()
 
-    # Input for location search
-    location_name = st.text_input("Enter a location name:")
+# Function to open the forecast archive once per server process
+@st.cache_resource
+def get_archive():
+    return fa.ForecastArchive()
 
-    # Get coordinates from location name
-    if location_name:
-        lat, lon = get_coordinates(location_name)
-        if lat and lon:
-            st.success(f"Coordinates for {location_name}: Latitude {lat}, Longitude {lon}")
-        else:
-            st.error(f"Could not find coordinates for {location_name}. Please try another location.")
-            lat, lon = 11.9338, 79.8298  # Default coordinates
-    else:
-        lat, lon = 11.9338, 79.8298  # Default coordinates
+# Function to share one rate limiter between the grid fetches of all sessions
+@st.cache_resource
+def get_rate_limiter():
+    return pw.RateLimiter()
 
-    # Folium map for selecting location
-    m = folium.Map(location=[lat, lon], zoom_start=5)
+# Function to fetch a regional lattice once per model run and keep it in memory
+# run_label only keys the cache so that a new model run triggers a refetch
+@st.cache_resource(max_entries=2)
+def get_grid(bounds, spacing, run_label):
+    grid, responses = gi.fetch_grid(bounds, spacing, limiter=get_rate_limiter())
+    get_archive().record_fetch(responses, models=[grid.model] * len(responses))
+    return grid
 
-    location_name_en = get_location_name(lat, lon)
-    if location_name_en:
-        popup_text = f"Selected Location: <span style='font-size:larger;'>{location_name_en}</span> (English)"
-    else:
-        popup_text = "Location Name Not Available"
+# Function to serve a pre-warmed forecast, or fetch and reduce one
+# In replay mode the newest archived run is used instead of the network
+# Points inside an active regional grid are interpolated without a fetch
+def get_forecast(lat, lon, grid=None):
+    if grid is not None and grid.contains(lat, lon):
+        with inst.span("grid_interpolate"):
+            response = grid.response(lat, lon)
+        return fp.summarize_response(response)
+
+    if fa.REPLAY:
+        with inst.span("archive_replay"):
+            response = get_archive().replay(lat, lon)
+        return fp.summarize_response(response) if response is not None else None
 
-    marker = folium.Marker(
-        location=[lat, lon], 
-        draggable=True,
-        popup=popup_text
-    )
-    m.add_child(marker)
+    with inst.span("prewarm_lookup"):
+        forecast = get_summary_store().get(lat, lon)
+    if forecast is not None:
+        return forecast
 
-    # Render Folium map in Streamlit
-    map_data = st_folium(m, width=700, height=500)
+    openmeteo = fp.build_client()
+    responses = fp.fetch_ensemble(lat, lon, client=openmeteo)
+    with inst.span("archive_record"):
+        get_archive().record_fetch(responses)
+    return fp.summarize_response(responses[0])
 
-    if map_data['last_clicked']:
-        lat = map_data['last_clicked']['lat']
-        lon = map_data['last_clicked']['lng']
+# Function to set up the session state shared by the page's units
+def init_state():
+    st.session_state.setdefault('location', fp.DEFAULT_COORDINATES)  # Selected (lat, lon)
+    st.session_state.setdefault('search_coordinates', None)  # Result of the last location search
+    st.session_state.setdefault('last_click', None)  # Last map click already applied
+    st.session_state.setdefault('forecasts', {})  # Reduced forecasts by location key
+    st.session_state.setdefault('forecast_key', None)  # Location key of the forecast on display
+    st.session_state.setdefault('grid_request', None)  # (bounds, spacing) of the last submitted grid
 
-    st.write(f"Selected Coordinates: Latitude {lat}, Longitude {lon}")
+# Function to key a forecast by location and by where it is served from
+def forecast_key(lat, lon, grid=None):
+    source = 'grid' if grid is not None and grid.contains(lat, lon) else ('replay' if fa.REPLAY else 'api')
+    return round(lat, 4), round(lon, 4), source
 
-    # Display Location Name
-    if lat and lon:
-        location_name_en = get_location_name(lat, lon)
+# Function to return the forecast for a location from the session cache, or compute and cache it
+def cached_forecast(lat, lon, grid=None):
+    key = forecast_key(lat, lon, grid)
+    forecasts = st.session_state.forecasts
+    cached = forecasts.get(key)
+    if cached is not None and time.time() - cached[0] < FORECAST_TTL:
+        return key, cached[1]
+
+    forecast = get_forecast(lat, lon, grid=grid)
+    if forecast is None:
+        return key, None
+    forecasts.pop(key, None)
+    forecasts[key] = (time.time(), forecast)
+    while len(forecasts) > MAX_SESSION_FORECASTS:
+        forecasts.pop(next(iter(forecasts)))  # Drop the oldest entry
+    return key, forecast
+
+# Location selection: search box and map
+# Runs as a fragment, so typing and map clicks rerun only this unit
+@st.fragment
+def location_selector():
+    with inst.fragment_request("forecast:location"):
+        # Input for location search
+        location_name = st.text_input("Enter a location name:")
+
+        # Get coordinates from location name
+        if location_name:
+            lat, lon = get_coordinates(location_name)
+            if lat and lon:
+                st.success(f"Coordinates for {location_name}: Latitude {lat}, Longitude {lon}")
+            else:
+                st.error(f"Could not find coordinates for {location_name}. Please try another location.")
+                lat, lon = fp.DEFAULT_COORDINATES  # Default coordinates
+        else:
+            lat, lon = fp.DEFAULT_COORDINATES  # Default coordinates
+
+        # A new search result replaces the selected location and recentres the map
+        if (lat, lon) != st.session_state.search_coordinates:
+            st.session_state.search_coordinates = (lat, lon)
+            st.session_state.location = (lat, lon)
+
+        # A new map click moves the selection. st_folium stores its latest value under the map key
+        # before this rerun starts, so the click is applied before the map is drawn
+        map_state = st.session_state.get(ml.MAP_KEY) or {}
+        clicked = map_state.get('last_clicked')
+        if clicked and clicked != st.session_state.last_click:
+            st.session_state.last_click = clicked
+            st.session_state.location = (clicked['lat'], clicked['lng'])
+
+        # Folium map for selecting location, with the pre-warmed sites clustered on it
+        sel_lat, sel_lon = st.session_state.location
+        location_name_en = get_location_name(round(sel_lat, 5), round(sel_lon, 5))
+        if location_name_en:
+            popup_text = f"Selected Location: <span style='font-size:larger;'>{location_name_en}</span> (English)"
+        else:
+            popup_text = "Location Name Not Available"
+
+        # Render Folium map in Streamlit
+        with inst.span("map_render"):
+            ml.render_map(sel_lat, sel_lon, popup_text, get_summary_store(),
+                          center=st.session_state.search_coordinates)
+
+        st.write(f"Selected Coordinates: Latitude {sel_lat}, Longitude {sel_lon}")
+
+        # Display Location Name
         if location_name_en:
             st.write(f"Selected Location : {location_name_en}")
         else:
             st.write("Location Name Not Available")
 
-    # Fetch weather data
-    if st.button("Get Weather Data"):
-        cache_session = requests_cache.CachedSession('.cache', expire_after=3600)
-        retry_session = setup_retry(cache_session, retries=5, backoff_factor=0.2)
-        openmeteo = Client(session=retry_session)
-        
-        url = "https://ensemble-api.open-meteo.com/v1/ensemble"
-        params = {
-            "latitude": lat,
-            "longitude": lon,
-            "hourly": ["temperature_2m", "weather_code", "relative_humidity_2m", "wind_speed_10m"],  # Add extra weather variables here
-            "forecast_days": 7,
-            "models": ["icon_seamless", "icon_global", "icon_eu", "icon_d2", "gfs_seamless", "gfs025", "gfs05", "ecmwf_ifs04", "ecmwf_ifs025", "gem_global", "bom_access_global_ensemble"]
-        }
-        responses = openmeteo.weather_api(url, params=params)
-        
-        response = responses[0]
-        st.write(f"Coordinates: {response.Latitude()}°N, {response.Longitude()}°E")
-        st.write(f"Elevation: {response.Elevation()} m asl")
-        
-        # Process hourly data
-        hourly = response.Hourly()
-        hourly_data = {
-            "date": pd.date_range(
-                start=pd.to_datetime(hourly.Time(), unit="s", utc=True),
-                end=pd.to_datetime(hourly.TimeEnd(), unit="s", utc=True),
-                freq=pd.Timedelta(seconds=hourly.Interval()),
-                inclusive="left"
-            )
-        }
-        
-        for i in range(hourly.VariablesLength()):
-            variable = hourly.Variables(i)
-            member = variable.EnsembleMember()
-            values = variable.ValuesAsNumpy()
-            if variable.Variable() == Variable.temperature and variable.Altitude() == 2:
-                hourly_data[f"temperature_2m_member{member}"] = values
-            elif variable.Variable() == Variable.weather_code:
-                hourly_data[f"weather_code_member{member}"] = values
-            elif variable.Variable() == Variable.relative_humidity and variable.Altitude() == 2:  # Add extra conditions for additional weather variables
-                hourly_data[f"relative_humidity_2m_member{member}"] = values
-            elif variable.Variable() == Variable.wind_speed and variable.Altitude() == 10:  # Assuming wind speed is measured at 10m height
-                hourly_data[f"wind_speed_10m_member{member}"] = values
-                 # Add more conditions for other weather variables as needed
-
-        df = pd.DataFrame(data=hourly_data)
-        df.set_index('date', inplace=True)
-
-        # Create columns for max_temp, max_weather_code, max_relative_humidity, max_wind_speed
-        df['max_temp'] = df[[col for col in df.columns if 'temperature_2m' in col]].max(axis=1)
-        df['min_temp'] = df[[col for col in df.columns if 'temperature_2m' in col]].min(axis=1)
-        df['mean_temp'] = df[['max_temp', 'min_temp']].mean(axis=1)
-        # df['max_weather_code'] = df[[col for col in df.columns if 'weather_code' in col]].max(axis=1)
-        df['max_relative_humidity'] = df[[col for col in df.columns if 'relative_humidity_2m' in col]].max(axis=1)
-        df['max_wind_speed'] = df[[col for col in df.columns if 'wind_speed_10m' in col]].max(axis=1)
-        
-        # Select columns that contain 'weather_code'
-        weather_code_columns = [col for col in df.columns if 'weather_code' in col]
-
-        # Define a function to find the mode for each row
-        def row_mode(series):
-            return series.mode().iloc[0] if not series.mode().empty else None
-
-        # Apply the function to each row to find the most frequent weather code
-        df['max_weather_code'] = df[weather_code_columns].apply(row_mode, axis=1)
-        
-
-        # Calculate daily mean
-        daily_mean = df.resample('D').mean()
-        daily_mean = daily_mean.dropna()  # Drop rows with NaN values
-        
-        # Calculate daily max
-        daily_max = df.resample('D').max()
-        daily_max = daily_max.dropna() 
-
-        # Remove time component from index
-        daily_mean.index = daily_max.index.date
-        daily_max.index = daily_max.index.date
-        
-        df['max_weather_code'] = df[[col for col in df.columns if 'weather_code' in col]].max(axis=1)
-        
-        df['weather_desc'] = df['max_weather_code'].map(wcd.map_weather_codes)
-        daily_max['weather_desc'] = daily_max['max_weather_code'].map(wcd.map_weather_codes)
+# Fetch/reduce and results: reruns only when its button is pressed
+# Forecasts are cached per location in session state, so revisiting a location only re-renders
+@st.fragment
+def forecast_panel(grid=None):
+    with inst.fragment_request("forecast:results"):
+        if st.button("Get Weather Data"):
+            lat, lon = st.session_state.location
+            key, forecast = cached_forecast(lat, lon, grid=grid)
+            if forecast is None:
+                st.error("No archived forecast run covers this location.")
+                return
+            st.session_state.forecast_key = key
+
+        cached = st.session_state.forecasts.get(st.session_state.forecast_key)
+        if cached is not None:
+            render_forecast(cached[1])
+
+# Chart rendering for a reduced forecast
+def render_forecast(forecast):
+    with inst.span("render_results"):
+        if 'fetched_at' in forecast:
+            st.info(f"Pre-warmed forecast for {forecast['name']}, fetched {forecast['fetched_at']:%Y-%m-%d %H:%M} UTC")
+        st.write(f"Coordinates: {forecast['latitude']}°N, {forecast['longitude']}°E")
+        st.write(f"Elevation: {forecast['elevation']} m asl")
+
+        df = forecast['hourly']
+        daily_mean = forecast['daily_mean']
+        daily_max = forecast['daily_max']
 
         # Display DataFrame
         st.write("Daily Data:")
         st.dataframe(daily_max[['max_temp', 'max_weather_code', 'max_relative_humidity', 'max_wind_speed', 'weather_desc']])
-        
+
         st.write("Daily Mean Data:")
         st.dataframe(daily_mean[['max_temp', 'max_weather_code', 'max_relative_humidity', 'max_wind_speed']])
 
@@ -199,7 +216,7 @@ def main():
         # Display DataFrame
         st.write("Overall Weather Data:")
         st.dataframe(df.head(24))
-        
+
         # Display Temperature Over Time
         st.subheader("Temperature Chart")
         st.line_chart(df['mean_temp'])
@@ -207,7 +224,7 @@ def main():
         # Display Code Over Time
         st.subheader("Weather Code Chart")
         st.line_chart(df['max_weather_code'])
-        
+
         # Display Code Over Time
         st.subheader("Weather Type Chart")
         st.scatter_chart(df['weather_desc'])
@@ -220,6 +237,44 @@ def main():
         st.subheader("Wind Speed Chart")
         st.line_chart(df['max_wind_speed'])
 
+# Streamlit App
+def main():
+    st.set_page_config(page_title="Global Weather Forecast", page_icon="🌦️")
+    st.markdown("# Global Weather Forecast")
+    st.sidebar.header("Global Weather Forecast")
+    inst.setup_page("forecast")
+    # Close the request even when the run is interrupted, so a later fragment-only rerun
+    # on this script thread does not join a stale request
+    try:
+        init_state()
+
+        # Regional grid mode answers clicks inside a region from one batched fetch
+        # The region is only fetched when the form is submitted, not on every slider movement
+        grid = None
+        if st.sidebar.checkbox("Regional grid mode", help="Interpolate forecasts inside a region from a coarse lattice fetched once per model run"):
+            with st.sidebar.form("regional_grid"):
+                lat_min, lat_max = st.slider("Latitude range", -90.0, 90.0, (gi.DEFAULT_BOUNDS[0], gi.DEFAULT_BOUNDS[1]))
+                lon_min, lon_max = st.slider("Longitude range", -180.0, 180.0, (gi.DEFAULT_BOUNDS[2], gi.DEFAULT_BOUNDS[3]))
+                spacing = st.select_slider("Lattice spacing (°)", options=[0.25, 0.5, 1.0, 2.0], value=gi.DEFAULT_SPACING)
+                if st.form_submit_button("Fetch grid"):
+                    st.session_state.grid_request = ((lat_min, lat_max, lon_min, lon_max), spacing)
+
+            if st.session_state.grid_request is not None:
+                run_label = pw.latest_refresh(datetime.now(timezone.utc)).isoformat()
+                try:
+                    with st.spinner("Fetching regional lattice..."), inst.span("grid_fetch"):
+                        grid = get_grid(*st.session_state.grid_request, run_label)
+                except ValueError as e:
+                    st.sidebar.error(str(e))
+                except fp.FETCH_ERRORS as e:
+                    st.sidebar.error(f"Fetching the regional lattice failed: {e}")
+
+        location_selector()
+        forecast_panel(grid)
+    finally:
+        record = inst.finish_request()
+    inst.render_timing_panel(record)
+
 if __name__ == '__main__':
     main()
 
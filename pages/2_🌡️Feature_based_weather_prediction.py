@@ -1,67 +1,37 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import MinMaxScaler, StandardScaler
-import pickle
-from tensorflow.keras.models import load_model
+import plotly.express as px
+import plotly.graph_objects as go
+import prediction_models as pm
+import instrumentation as inst
 
 st.set_page_config(page_title="Feature based weather prediction", page_icon="🌡️")
 st.markdown("# Feature based weather prediction")
 st.sidebar.header("Feature based weather prediction")
+inst.setup_page("prediction")
 
-# Load the LSTM model and scalers
-loaded_lstm_model = load_model('models/lstm_weather_model.h5')
+# Load the models and scalers once per server process and artifact version
+@st.cache_resource
+def load_models(model_dir):
+    return pm.load_models(model_dir)
 
-with open('models/lstm_model.pkl', 'rb') as f:
-    lstm_scalers = pickle.load(f)
-    lstm_scaler_features = lstm_scalers['scaler_features']
-    lstm_scaler_target = lstm_scalers['scaler_target']
-
-# Load the XGBoost model
-with open('models/xgboost_model.pkl', 'rb') as f:
-    loaded_xgboost_model = pickle.load(f)
-
-# Load the Ridge Regression model and scaler
-with open('models/ridge_regression_model.pkl', 'rb') as f:
-    ridge_data = pickle.load(f)
-    loaded_ridge_model = ridge_data['model']
-    ridge_scaler = ridge_data['scaler']
+with inst.span("load_models"):
+    models = load_models(pm.resolve_model_dir())
 
 # Column names for features
-feature_names = ['tmin', 'tmean', 'atmax', 'atmin', 'atmean', 'sun_dur', 'prec_sum',
-                 'prec_hrs', 'wsmax', 'wgmax', 'wdirdom', 'radsum', 'evapotrans']
-
-def preprocess_data(data, scaler_features):
-    data_df = pd.DataFrame(data, columns=feature_names)
-    scaled_data = scaler_features.transform(data_df)
-    return scaled_data
-
-def postprocess_data(data, scaler_target):
-    return scaler_target.inverse_transform(data)
-
-# Function to make predictions for all models
-def predict_all_models(data):
-    predictions = {}
+feature_names = pm.feature_names
 
-    # LSTM
-    scaled_input_lstm = preprocess_data(data, lstm_scaler_features)
-    prediction_lstm = loaded_lstm_model.predict(scaled_input_lstm.reshape(1, scaled_input_lstm.shape[0], scaled_input_lstm.shape[1]))
-    prediction_lstm = postprocess_data(prediction_lstm, lstm_scaler_target)
-    predictions['LSTM'] = prediction_lstm[0][0]
-
-    # XGBoost
-    scaled_input_xgb = preprocess_data(data, lstm_scaler_features)
-    prediction_xgb = loaded_xgboost_model.predict(scaled_input_xgb)
-    predictions['XGBoost'] = prediction_xgb[0]
+st.title('Weather Prediction')
 
-    # Ridge Regression
-    scaled_input_ridge = ridge_scaler.transform(data)
-    prediction_ridge = loaded_ridge_model.predict(scaled_input_ridge)
-    predictions['Ridge Regression'] = prediction_ridge[0]
+# Show the training-time metrics of versioned artifacts
+if models['manifest']:
+    with st.expander(f"Model version {models['manifest']['version']}"):
+        st.write(f"Trained {models['manifest']['created']} on {models['manifest']['train_rows']} rows, "
+                 f"evaluated on the most recent {models['manifest']['holdout_rows']} rows:")
+        st.write(pd.DataFrame(models['manifest']['models']).T[['mae', 'rmse']])
 
-    return predictions
-
-st.title('Weather Prediction')
+mode = st.sidebar.radio("Mode:", ("Single prediction", "Sensitivity analysis"))
 
 # Sidebar inputs for features with synchronized sliders
 st.sidebar.header('Input Features')
@@ -94,10 +64,54 @@ input_df = pd.DataFrame([inputs], columns=feature_names)
 st.subheader('User Input Features')
 st.write(input_df)
 
-# Make predictions for all models
-predictions = predict_all_models(input_df.values)
-
-# Display the predictions
-st.subheader('Predictions')
-for model_name, prediction in predictions.items():
-    st.write(f'{model_name} Predicted tmax: {prediction:.2f}')
+if mode == "Single prediction":
+    # Make predictions for all models
+    predictions = pm.predict_all_models(models, input_df.values)
+
+    # Display the predictions
+    st.subheader('Predictions')
+    for model_name, prediction in predictions.items():
+        st.write(f'{model_name} Predicted tmax: {prediction[0]:.2f}')
+
+else:
+    st.subheader('Sensitivity Analysis')
+    st.write("Sweep one or two features across a range while every other feature stays at its slider value.")
+
+    feature_x = st.selectbox("Feature to sweep:", feature_names)
+    range_x = st.slider(f"{feature_x.capitalize()} range:", 0.0, 100.0, (0.0, 100.0))
+    feature_y = st.selectbox("Second feature (optional):", ["None"] + [name for name in feature_names if name != feature_x])
+    feature_y = None if feature_y == "None" else feature_y
+
+    if feature_y is None:
+        points = st.slider("Points:", 10, 10000, 200)
+        values_x = np.linspace(*range_x, points)
+
+        with inst.span("sweep"):
+            curves = pm.sweep(models, input_df.values, feature_x, values_x)
+
+        # Partial-dependence curve for each model
+        fig = go.Figure()
+        for model_name, curve in curves.items():
+            fig.add_trace(go.Scatter(x=values_x, y=curve, mode='lines', name=model_name))
+        fig.update_layout(title=f"Predicted tmax vs {feature_x}", xaxis_title=feature_x, yaxis_title="Predicted tmax")
+        st.plotly_chart(fig)
+
+    else:
+        range_y = st.slider(f"{feature_y.capitalize()} range:", 0.0, 100.0, (0.0, 100.0))
+        points = st.slider("Points per axis:", 10, 200, 100)
+        values_x = np.linspace(*range_x, points)
+        values_y = np.linspace(*range_y, points)
+        st.write(f"Grid size: {points * points} points")
+
+        with inst.span("sweep"):
+            surfaces = pm.sweep(models, input_df.values, feature_x, values_x, feature_y, values_y)
+
+        # Heatmap of the predicted tmax for each model
+        for model_name, surface in surfaces.items():
+            fig = px.imshow(surface, x=values_x, y=values_y, origin='lower', aspect='auto',
+                            labels={'x': feature_x, 'y': feature_y, 'color': 'Predicted tmax'},
+                            title=f"{model_name} predicted tmax")
+            st.plotly_chart(fig)
+
+record = inst.finish_request()
+inst.render_timing_panel(record)
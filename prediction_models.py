@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import MinMaxScaler, StandardScaler
+from tensorflow.keras.models import load_model
+from instrumentation import span
+
+MODEL_DIR = 'models'
+LATEST_FILE = 'LATEST'  # Names the newest versioned artifact directory inside MODEL_DIR
+MANIFEST_FILE = 'manifest.json'
+
+# Column names for features
+feature_names = ['tmin', 'tmean', 'atmax', 'atmin', 'atmean', 'sun_dur', 'prec_sum',
+                 'prec_hrs', 'wsmax', 'wgmax', 'wdirdom', 'radsum', 'evapotrans']
+
+# Function to hash a data or artifact file, used to key backtest scores and in training manifests
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+# Function to find the artifact directory to load
+# Versioned artifacts from train_models.py win over the flat files bundled in models/
+def resolve_model_dir(model_dir=MODEL_DIR):
+    try:
+        with open(os.path.join(model_dir, LATEST_FILE)) as f:
+            version = f.read().strip()
+    except OSError:
+        return model_dir
+    return os.path.join(model_dir, version) if version else model_dir
+
+# Function to read the training manifest of an artifact directory, if there is one
+def load_manifest(model_dir):
+    try:
+        with open(os.path.join(model_dir, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except OSError:
+        return None
+
+# Function to load the LSTM, XGBoost and Ridge Regression models with their scalers
+def load_models(model_dir=None):
+    model_dir = model_dir or resolve_model_dir()
+    models = {'model_dir': model_dir, 'manifest': load_manifest(model_dir)}
+
+    # Load the LSTM model and scalers
+    with span("load:LSTM"):
+        models['lstm'] = load_model(os.path.join(model_dir, 'lstm_weather_model.h5'))
+        with open(os.path.join(model_dir, 'lstm_model.pkl'), 'rb') as f:
+            lstm_scalers = pickle.load(f)
+            models['lstm_scaler_features'] = lstm_scalers['scaler_features']
+            models['lstm_scaler_target'] = lstm_scalers['scaler_target']
+
+    # Load the XGBoost model
+    with span("load:XGBoost"):
+        with open(os.path.join(model_dir, 'xgboost_model.pkl'), 'rb') as f:
+            models['xgboost'] = pickle.load(f)
+
+    # Load the Ridge Regression model and scaler
+    with span("load:Ridge Regression"):
+        with open(os.path.join(model_dir, 'ridge_regression_model.pkl'), 'rb') as f:
+            ridge_data = pickle.load(f)
+            models['ridge'] = ridge_data['model']
+            models['ridge_scaler'] = ridge_data['scaler']
+
+    return models
+
+LSTM_BATCH_SIZE = 8192
+
+# Function to apply a fitted MinMaxScaler or StandardScaler as plain array arithmetic
+# This skips sklearn's per-call validation, which dominates for small and large batches alike
+def fast_transform(scaler, data):
+    if isinstance(scaler, MinMaxScaler):
+        scaled = data * scaler.scale_ + scaler.min_
+        if getattr(scaler, 'clip', False):
+            scaled = np.clip(scaled, *scaler.feature_range)
+        return scaled
+    if isinstance(scaler, StandardScaler):
+        if scaler.with_mean:
+            data = data - scaler.mean_
+        if scaler.with_std:
+            data = data / scaler.scale_
+        return data
+    return scaler.transform(pd.DataFrame(data, columns=feature_names))
+
+def fast_inverse_transform(scaler, data):
+    if isinstance(scaler, MinMaxScaler):
+        return (data - scaler.min_) / scaler.scale_
+    if isinstance(scaler, StandardScaler):
+        if scaler.with_std:
+            data = data * scaler.scale_
+        if scaler.with_mean:
+            data = data + scaler.mean_
+        return data
+    return scaler.inverse_transform(data)
+
+def preprocess_data(data, scaler_features):
+    return fast_transform(scaler_features, data)
+
+def postprocess_data(data, scaler_target):
+    return fast_inverse_transform(scaler_target, data)
+
+# LSTM, one time step per row
+def predict_lstm(models, data):
+    scaled_input_lstm = preprocess_data(data, models['lstm_scaler_features'])
+    prediction_lstm = models['lstm'].predict(scaled_input_lstm.reshape(scaled_input_lstm.shape[0], 1, scaled_input_lstm.shape[1]),
+                                             batch_size=LSTM_BATCH_SIZE, verbose=0)
+    prediction_lstm = postprocess_data(prediction_lstm, models['lstm_scaler_target'])
+    return prediction_lstm[:, 0]
+
+# XGBoost, on the LSTM feature scaling
+def predict_xgboost(models, data):
+    scaled_input_xgb = preprocess_data(data, models['lstm_scaler_features'])
+    return models['xgboost'].predict(scaled_input_xgb)
+
+# Ridge Regression
+def predict_ridge(models, data):
+    scaled_input_ridge = fast_transform(models['ridge_scaler'], data)
+    return models['ridge'].predict(scaled_input_ridge)
+
+MODEL_PREDICTORS = {
+    'LSTM': predict_lstm,
+    'XGBoost': predict_xgboost,
+    'Ridge Regression': predict_ridge,
+}
+
+# Artifact files each model's predictions depend on
+MODEL_FILES = {
+    'LSTM': ['lstm_weather_model.h5', 'lstm_model.pkl'],
+    'XGBoost': ['xgboost_model.pkl', 'lstm_model.pkl'],
+    'Ridge Regression': ['ridge_regression_model.pkl'],
+}
+
+# Function to make predictions for all models
+# Every row of data is scored in one batched call per model
+def predict_all_models(models, data, model_names=None):
+    data = np.atleast_2d(np.asarray(data, dtype=float))
+    predictions = {}
+    for model_name in model_names or MODEL_PREDICTORS:
+        with span(f"predict:{model_name}"):
+            predictions[model_name] = MODEL_PREDICTORS[model_name](models, data)
+    return predictions
+
+# Function to build the inference grid for a one- or two-feature sweep
+# Every other feature is held at its value in base_row
+def feature_grid(base_row, feature_x, values_x, feature_y=None, values_y=None):
+    base_row = np.asarray(base_row, dtype=float).reshape(-1)
+    values_x = np.asarray(values_x, dtype=float)
+    if feature_y is None:
+        grid = np.tile(base_row, (len(values_x), 1))
+        grid[:, feature_names.index(feature_x)] = values_x
+        return grid
+
+    values_y = np.asarray(values_y, dtype=float)
+    grid = np.tile(base_row, (len(values_y) * len(values_x), 1))
+    mesh_x, mesh_y = np.meshgrid(values_x, values_y)
+    grid[:, feature_names.index(feature_x)] = mesh_x.ravel()
+    grid[:, feature_names.index(feature_y)] = mesh_y.ravel()
+    return grid
+
+# Function to score a feature sweep with one batched call per model
+# Returns curves of shape (len(values_x),) or surfaces of shape (len(values_y), len(values_x))
+def sweep(models, base_row, feature_x, values_x, feature_y=None, values_y=None):
+    grid = feature_grid(base_row, feature_x, values_x, feature_y, values_y)
+    predictions = predict_all_models(models, grid)
+    if feature_y is None:
+        return predictions
+    shape = (len(values_y), len(values_x))
+    return {model_name: prediction.reshape(shape) for model_name, prediction in predictions.items()}
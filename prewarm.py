@@ -0,0 +1,240 @@
+import argparse
+import csv
+import html
+import json
+import logging
+import math
+import os
+import pickle
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+import forecast_pipeline as fp
+
+STORE_DIR = '.prewarm'
+SITES_FILE = 'sites.csv'
+
+# Ensemble runs start at these UTC hours and reach the API a few hours later
+MODEL_CYCLE_HOURS = (0, 6, 12, 18)
+AVAILABILITY_DELAY = timedelta(hours=5)
+
+REQUESTS_PER_MINUTE = 30  # Stays well below the Open-Meteo free-tier limit
+MATCH_TOLERANCE = 0.05  # Degrees between a clicked point and a pre-warmed site
+MAX_AGE = timedelta(hours=7)
+
+logger = logging.getLogger('prewarm')
+
+
+# Function to read the site list as dicts with name, latitude and longitude
+def read_sites(path=SITES_FILE):
+    with open(path, newline='') as f:
+        return [
+            {'name': row['name'], 'latitude': float(row['latitude']), 'longitude': float(row['longitude'])}
+            for row in csv.DictReader(f)
+        ]
+
+
+def site_key(latitude, longitude):
+    return f"{latitude:.4f}_{longitude:.4f}"
+
+
+# Function to find the next refresh time after a model run becomes available
+def next_refresh(now, cycle_hours=MODEL_CYCLE_HOURS, delay=AVAILABILITY_DELAY):
+    day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    candidates = [
+        day + timedelta(days=offset, hours=hour) + delay
+        for offset in (-1, 0, 1)
+        for hour in cycle_hours
+    ]
+    return min(candidate for candidate in candidates if candidate > now)
+
+
+# Function to find the most recent refresh time at or before now
+# Used to key data that should be refetched once per model run
+def latest_refresh(now, cycle_hours=MODEL_CYCLE_HOURS, delay=AVAILABILITY_DELAY):
+    day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    candidates = [
+        day + timedelta(days=offset, hours=hour) + delay
+        for offset in (-2, -1, 0)
+        for hour in cycle_hours
+    ]
+    return max(candidate for candidate in candidates if candidate <= now)
+
+
+# Paces calls so that no more than the given number start per minute
+# Safe to share between threads: each caller reserves its own slot under the lock, then sleeps outside it
+class RateLimiter:
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE, clock=time.monotonic, sleep=time.sleep):
+        self.interval = 60.0 / requests_per_minute
+        self.clock = clock
+        self.sleep = sleep
+        self.next_slot = None
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = self.clock()
+            slot = now if self.next_slot is None else max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            self.sleep(slot - now)
+
+
+# Function to precompute the map popup for a site from its daily summary
+def summary_popup(name, summary):
+    lines = [f"<b>{html.escape(name)}</b>"]
+    daily_max = summary['daily_max']
+    for day, row in daily_max.head(fp.FORECAST_DAYS).iterrows():
+        lines.append(f"{day:%a %d %b}: {row['max_temp']:.0f}°C {row['weather_desc']}")
+    return '<br>'.join(lines)
+
+
+# Stores the finished summaries on disk, one pickle per site plus a JSON index
+class SummaryStore:
+    def __init__(self, directory=STORE_DIR):
+        self.directory = directory
+        self.index_path = os.path.join(directory, 'index.json')
+        self._index = None
+        self._index_mtime = None
+        self._pending = {}  # Index entries put since the last flush
+
+    def _read_index(self):
+        try:
+            mtime = os.path.getmtime(self.index_path)
+        except OSError:
+            return {}
+        if mtime != self._index_mtime:
+            with open(self.index_path) as f:
+                self._index = json.load(f)
+            self._index_mtime = mtime
+        return self._index
+
+    # Write to a temporary file first so readers never see a partial file
+    def _write_atomic(self, path, write):
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+
+    # Function to store a site's summary
+    # With flush=False the index entry is held until flush(), so a pass rewrites the index once
+    def put(self, site, summary, fetched_at, flush=True):
+        os.makedirs(self.directory, exist_ok=True)
+        key = site_key(site['latitude'], site['longitude'])
+        entry = {**summary, 'name': site['name'], 'fetched_at': fetched_at}
+        self._write_atomic(os.path.join(self.directory, f'{key}.pkl'), lambda f: pickle.dump(entry, f))
+
+        self._pending[key] = {
+            'name': site['name'],
+            'latitude': site['latitude'],
+            'longitude': site['longitude'],
+            'fetched_at': fetched_at.isoformat(),
+            'popup': summary_popup(site['name'], summary),
+        }
+        if flush:
+            self.flush()
+
+    # Function to write the pending entries into the index
+    def flush(self):
+        if not self._pending:
+            return
+        index = {**self._read_index(), **self._pending}
+        self._write_atomic(self.index_path, lambda f: f.write(json.dumps(index, indent=2).encode()))
+        self._pending = {}
+
+    # Function to return the stored summary nearest to a point, if fresh and close enough
+    def get(self, latitude, longitude, tolerance=MATCH_TOLERANCE, max_age=MAX_AGE, now=None):
+        index = self._read_index()
+        if not index:
+            return None
+
+        key, site = min(index.items(), key=lambda item: math.hypot(item[1]['latitude'] - latitude,
+                                                                   item[1]['longitude'] - longitude))
+        if math.hypot(site['latitude'] - latitude, site['longitude'] - longitude) > tolerance:
+            return None
+        now = now or datetime.now(timezone.utc)
+        if now - datetime.fromisoformat(site['fetched_at']) > max_age:
+            return None
+
+        try:
+            with open(os.path.join(self.directory, f'{key}.pkl'), 'rb') as f:
+                return pickle.load(f)
+        except OSError:
+            return None
+
+    def sites(self):
+        return self._read_index()
+
+    def index_mtime(self):
+        try:
+            return os.path.getmtime(self.index_path)
+        except OSError:
+            return None
+
+
+# Function to fetch and reduce forecasts for every site, pacing the requests
+# The index is written once at the end of the pass, so readers see one change per pass
+def prewarm_sites(sites, store, fetch=None, limiter=None):
+    fetch = fetch or _fetch_first_response(fp.build_client(cache_name=None), fp.ENSEMBLE_URL)
+    limiter = limiter or RateLimiter()
+    failures = 0
+    try:
+        for site in sites:
+            limiter.wait()
+            try:
+                response = fetch(site['latitude'], site['longitude'])
+                summary = fp.summarize_response(response)
+            except Exception:
+                logger.exception("Pre-warming %s failed", site['name'])
+                failures += 1
+                continue
+            store.put(site, summary, datetime.now(timezone.utc), flush=False)
+            logger.info("Pre-warmed %s", site['name'])
+    finally:
+        store.flush()
+    return len(sites) - failures, failures
+
+
+def _fetch_first_response(client, url):
+    def fetch(latitude, longitude):
+        return fp.fetch_ensemble(latitude, longitude, client=client, url=url)[0]
+    return fetch
+
+
+# Function to refresh all sites now and then after each model run
+def run_scheduler(sites_file, store, url, requests_per_minute, interval=None, once=False):
+    client = fp.build_client(cache_name=None)
+    fetch = _fetch_first_response(client, url)
+    limiter = RateLimiter(requests_per_minute)
+    while True:
+        sites = read_sites(sites_file)  # Re-read so edits to the site list apply on the next pass
+        warmed, failed = prewarm_sites(sites, store, fetch=fetch, limiter=limiter)
+        logger.info("Pass finished: %d sites pre-warmed, %d failed", warmed, failed)
+        if once:
+            return
+
+        now = datetime.now(timezone.utc)
+        wake = now + interval if interval else next_refresh(now)
+        logger.info("Next refresh at %s", wake.isoformat())
+        time.sleep(max(0.0, (wake - datetime.now(timezone.utc)).total_seconds()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-warm ensemble forecasts for a list of sites.")
+    parser.add_argument('--sites', default=SITES_FILE, help="CSV file with name, latitude and longitude columns")
+    parser.add_argument('--store', default=STORE_DIR)
+    parser.add_argument('--url', default=fp.ENSEMBLE_URL, help="Ensemble API endpoint, e.g. a local stub for testing")
+    parser.add_argument('--requests-per-minute', type=float, default=REQUESTS_PER_MINUTE)
+    parser.add_argument('--interval-minutes', type=float, default=None,
+                        help="Fixed refresh interval instead of following the model run times")
+    parser.add_argument('--once', action='store_true', help="Run a single pass and exit")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    interval = timedelta(minutes=args.interval_minutes) if args.interval_minutes else None
+    run_scheduler(args.sites, SummaryStore(args.store), args.url, args.requests_per_minute,
+                  interval=interval, once=args.once)
+
+
+if __name__ == '__main__':
+    main()
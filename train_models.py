@@ -0,0 +1,218 @@
+import argparse
+import json
+import logging
+import os
+import pickle
+import platform
+from datetime import datetime, timezone
+import numpy as np
+import sklearn
+import tensorflow as tf
+import xgboost
+from sklearn.linear_model import Ridge
+from sklearn.metrics import mean_absolute_error, mean_squared_error
+from sklearn.model_selection import GridSearchCV, TimeSeriesSplit
+from sklearn.preprocessing import MinMaxScaler, StandardScaler
+from xgboost import XGBRegressor
+import prediction_models as pm
+import weather_schema as ws
+
+DATA_FILE = 'dataset/data.csv'
+SEED = 42
+HOLDOUT_FRACTION = 0.15  # Most recent share of the history kept out of training for the metrics
+VALIDATION_FRACTION = 0.1  # Most recent share of the training part used for LSTM early stopping
+CV_SPLITS = 5
+
+XGBOOST_GRID = {
+    'n_estimators': [200, 400],
+    'max_depth': [3, 5, 7],
+    'learning_rate': [0.05, 0.1],
+    'subsample': [0.8, 1.0],
+}
+RIDGE_GRID = {
+    'alpha': [0.01, 0.1, 1.0, 10.0, 100.0],
+}
+
+# Same stacked layout as the bundled model. The bundled model was built for 10-day windows,
+# but the prediction page, backtest and sweeps all feed it one feature row, so it is trained on those
+LSTM_UNITS = 50
+LSTM_TIMESTEPS = 1
+LSTM_EPOCHS = 30
+LSTM_BATCH_SIZE = 256
+
+logger = logging.getLogger('train_models')
+
+
+# Function to build features and the next-day tmax target, as in the EDA notebooks
+def load_training_data(data_file=DATA_FILE):
+    data, _ = ws.load_weather_data(data_file)
+    data = data.assign(tar_tmax=data['tmax'].shift(-1))
+    data = data.dropna(subset=pm.feature_names + ['tar_tmax'])
+    features = data[pm.feature_names].to_numpy(dtype=np.float64)
+    target = data['tar_tmax'].to_numpy(dtype=np.float64)
+    return features, target, data.index
+
+
+# Function to split the history chronologically into training and holdout parts
+def chronological_split(features, target, holdout_fraction=HOLDOUT_FRACTION):
+    split = int(len(features) * (1 - holdout_fraction))
+    return features[:split], target[:split], features[split:], target[split:]
+
+
+def metrics(actual, predicted):
+    return {
+        'mae': float(mean_absolute_error(actual, predicted)),
+        'rmse': float(mean_squared_error(actual, predicted) ** 0.5),
+    }
+
+
+# Function to run a time-ordered cross-validated grid search across all cores
+def grid_search(estimator, grid, features, target, jobs):
+    search = GridSearchCV(estimator, grid, cv=TimeSeriesSplit(n_splits=CV_SPLITS),
+                          scoring='neg_mean_absolute_error', n_jobs=jobs)
+    search.fit(features, target)
+    logger.info("%s best params %s (CV MAE %.3f)", type(estimator).__name__, search.best_params_, -search.best_score_)
+    return search
+
+
+# Function to stream (batch, 1, feature) windows to the LSTM without materialising a 3D copy
+# Keras calls the generator once per epoch; the generator is seeded once, so each epoch gets a new,
+# reproducible order
+def lstm_batches(features, target, batch_size=LSTM_BATCH_SIZE, shuffle=True, seed=SEED):
+    rng = np.random.default_rng(seed)
+
+    def generator():
+        order = rng.permutation(len(features)) if shuffle else np.arange(len(features))
+        for start in range(0, len(order), batch_size):
+            rows = order[start:start + batch_size]
+            yield features[rows, np.newaxis, :].astype(np.float32), target[rows].astype(np.float32)
+
+    signature = (
+        tf.TensorSpec(shape=(None, 1, features.shape[1]), dtype=tf.float32),
+        tf.TensorSpec(shape=(None, target.shape[1]), dtype=tf.float32),
+    )
+    return tf.data.Dataset.from_generator(generator, output_signature=signature).prefetch(tf.data.AUTOTUNE)
+
+
+def build_lstm(n_features, units=LSTM_UNITS):
+    model = tf.keras.Sequential([
+        tf.keras.layers.Input(shape=(LSTM_TIMESTEPS, n_features)),
+        tf.keras.layers.LSTM(units, return_sequences=True),
+        tf.keras.layers.LSTM(units),
+        tf.keras.layers.Dense(1),
+    ])
+    model.compile(optimizer='adam', loss='mse')
+    return model
+
+
+# Function to train all three models and write a versioned artifact directory
+def train(data_file=DATA_FILE, model_dir=pm.MODEL_DIR, version=None, jobs=-1, epochs=LSTM_EPOCHS, seed=SEED):
+    tf.keras.utils.set_random_seed(seed)
+    version = version or datetime.now(timezone.utc).strftime('v%Y%m%dT%H%M%SZ')
+    out_dir = os.path.join(model_dir, version)
+    os.makedirs(out_dir)
+
+    features, target, dates = load_training_data(data_file)
+    train_x, train_y, test_x, test_y = chronological_split(features, target)
+    logger.info("Training on %d rows, holding out %d", len(train_x), len(test_x))
+
+    # Fit the scalers once on the training part and share them between models
+    scaler_features = MinMaxScaler().fit(train_x)
+    scaler_target = MinMaxScaler().fit(train_y.reshape(-1, 1))
+    ridge_scaler = StandardScaler().fit(train_x)
+    scaled_train_x = scaler_features.transform(train_x)
+    scaled_test_x = scaler_features.transform(test_x)
+
+    manifest = {
+        'version': version,
+        'created': datetime.now(timezone.utc).isoformat(),
+        'data_file': data_file,
+        'data_sha256': pm.file_sha256(data_file),
+        'seed': seed,
+        'train_rows': len(train_x),
+        'train_end': dates[len(train_x) - 1].date().isoformat(),  # Last feature date seen in training
+        'holdout_rows': len(test_x),
+        'features': pm.feature_names,
+        'target': 'next-day tmax',
+        'libraries': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'scikit-learn': sklearn.__version__,
+            'xgboost': xgboost.__version__,
+            'tensorflow': tf.__version__,
+        },
+        'models': {},
+    }
+
+    # XGBoost, on the shared MinMax feature scaling like the bundled model
+    xgb_search = grid_search(XGBRegressor(random_state=seed, n_jobs=1), XGBOOST_GRID, scaled_train_x, train_y, jobs)
+    with open(os.path.join(out_dir, 'xgboost_model.pkl'), 'wb') as f:
+        pickle.dump(xgb_search.best_estimator_, f)
+    manifest['models']['XGBoost'] = {
+        'params': xgb_search.best_params_,
+        'cv_mae': float(-xgb_search.best_score_),
+        **metrics(test_y, xgb_search.best_estimator_.predict(scaled_test_x)),
+    }
+
+    # Ridge Regression, with its own standard scaling
+    ridge_search = grid_search(Ridge(), RIDGE_GRID, ridge_scaler.transform(train_x), train_y, jobs)
+    with open(os.path.join(out_dir, 'ridge_regression_model.pkl'), 'wb') as f:
+        pickle.dump({'model': ridge_search.best_estimator_, 'scaler': ridge_scaler}, f)
+    manifest['models']['Ridge Regression'] = {
+        'params': ridge_search.best_params_,
+        'cv_mae': float(-ridge_search.best_score_),
+        **metrics(test_y, ridge_search.best_estimator_.predict(ridge_scaler.transform(test_x))),
+    }
+
+    # LSTM, streamed in batches
+    # Early stopping watches the most recent slice of the training part, so the holdout stays unseen
+    scaled_train_y = scaler_target.transform(train_y.reshape(-1, 1))
+    fit_x, fit_y, val_x, val_y = chronological_split(scaled_train_x, scaled_train_y, VALIDATION_FRACTION)
+    lstm = build_lstm(len(pm.feature_names))
+    history = lstm.fit(
+        lstm_batches(fit_x, fit_y, seed=seed),
+        validation_data=lstm_batches(val_x, val_y, shuffle=False),
+        epochs=epochs,
+        callbacks=[tf.keras.callbacks.EarlyStopping(patience=5, restore_best_weights=True)],
+        verbose=2,
+    )
+    lstm.save(os.path.join(out_dir, 'lstm_weather_model.h5'))
+    with open(os.path.join(out_dir, 'lstm_model.pkl'), 'wb') as f:
+        pickle.dump({'scaler_features': scaler_features, 'scaler_target': scaler_target}, f)
+    lstm_predictions = scaler_target.inverse_transform(
+        lstm.predict(scaled_test_x[:, np.newaxis, :], batch_size=pm.LSTM_BATCH_SIZE, verbose=0))[:, 0]
+    manifest['models']['LSTM'] = {
+        'params': {'layers': 2, 'units': LSTM_UNITS, 'timesteps': LSTM_TIMESTEPS, 'batch_size': LSTM_BATCH_SIZE,
+                   'epochs_run': len(history.history['loss'])},
+        **metrics(test_y, lstm_predictions),
+    }
+
+    with open(os.path.join(out_dir, pm.MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    # Point the prediction page at the new version only once every artifact is written
+    tmp_path = os.path.join(model_dir, f'{pm.LATEST_FILE}.tmp')
+    with open(tmp_path, 'w') as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(model_dir, pm.LATEST_FILE))
+    logger.info("Wrote %s", out_dir)
+    return out_dir, manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the LSTM, XGBoost and Ridge models and write versioned artifacts.")
+    parser.add_argument('--data', default=DATA_FILE)
+    parser.add_argument('--model-dir', default=pm.MODEL_DIR)
+    parser.add_argument('--version', default=None, help="Artifact version name (default: UTC timestamp)")
+    parser.add_argument('--jobs', type=int, default=-1, help="Parallel grid-search jobs (default: all cores)")
+    parser.add_argument('--epochs', type=int, default=LSTM_EPOCHS)
+    parser.add_argument('--seed', type=int, default=SEED)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    _, manifest = train(args.data, args.model_dir, args.version, args.jobs, args.epochs, args.seed)
+    print(json.dumps(manifest['models'], indent=2))
+
+
+if __name__ == '__main__':
+    main()
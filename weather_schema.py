@@ -0,0 +1,49 @@
+import pandas as pd
+
+# Compact dtypes for the columns of dataset/data.csv
+MEASUREMENT_COLUMNS = ['tmax', 'tmin', 'tmean', 'atmax', 'atmin', 'atmean', 'sun_dur', 'prec_sum',
+                       'prec_hrs', 'wsmax', 'wgmax', 'wdirdom', 'radsum', 'evapotrans']
+
+WEATHER_DTYPES = {column: 'float32' for column in MEASUREMENT_COLUMNS}
+WEATHER_DTYPES['weather_code'] = 'category'
+
+# Calendar fields derived from the date index
+CALENDAR_DTYPES = {
+    'year': 'int16',
+    'month': 'int8',
+}
+
+# Weather descriptions that indicate rain
+RAIN_DESCRIPTIONS = ["Light Drizzle", "Drizzle", "Heavy Drizzle", "Light Rain", "Rain", "Heavy Rain"]
+
+
+# Function to measure the deep memory footprint of a DataFrame in megabytes
+def memory_usage_mb(df):
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+
+# Function to add small-int calendar columns from the date index
+def add_calendar_columns(df):
+    df['year'] = df.index.year.astype(CALENDAR_DTYPES['year'])
+    df['month'] = df.index.month.astype(CALENDAR_DTYPES['month'])
+    return df
+
+
+# Function to load the historical dataset, parsed straight into the compact schema
+# Returns the data along with its memory footprint
+def load_weather_data(path="dataset/data.csv", calendar=False):
+    data = pd.read_csv(path, parse_dates=["date"], index_col="date", dtype=WEATHER_DTYPES)
+    if calendar:
+        data = add_calendar_columns(data)
+    return data, {'memory_mb': memory_usage_mb(data)}
+
+
+# Function to measure the footprint of the dataset as parsed with pandas' default dtypes
+# Parses the whole file a second time, so only the benchmarks call it
+def raw_memory_usage_mb(path="dataset/data.csv"):
+    return memory_usage_mb(pd.read_csv(path, parse_dates=["date"], index_col="date"))
+
+
+# Function to build a boolean mask of rainy days instead of copying the rows
+def rain_mask(data):
+    return data['weather_code'].isin(RAIN_DESCRIPTIONS).to_numpy()